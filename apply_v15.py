@@ -1,26 +1,4 @@
-import zlib
-import struct
-import math
-
-def make_png(width, height, draw_func, is_rgba=False):
-    png = b'\x89PNG\r\n\x1a\n'
-    color_type = 6 if is_rgba else 2
-    ihdr_content = struct.pack('!IIBBBBB', width, height, 8, color_type, 0, 0, 0)
-    ihdr = b'IHDR' + ihdr_content
-    png += struct.pack('!I', len(ihdr_content)) + ihdr + struct.pack('!I', zlib.crc32(ihdr) & 0xFFFFFFFF)
-
-    raw_data = b''
-    for y in range(height):
-        raw_data += b'\x00'
-        for x in range(width):
-            raw_data += bytes(draw_func(x, y, width, height))
-    
-    compressor = zlib.compressobj()
-    idat_data = compressor.compress(raw_data) + compressor.flush()
-    idat = b'IDAT' + idat_data
-    png += struct.pack('!I', len(idat_data)) + idat + struct.pack('!I', zlib.crc32(idat) & 0xFFFFFFFF)
-    png += struct.pack('!I', 0) + b'IEND' + struct.pack('!I', zlib.crc32(b'IEND') & 0xFFFFFFFF)
-    return png
+from png_encoder import make_png
 
 # V15: Bean + Pen Nib (Coffee + Logging)
 def draw_v15_solid(x, y, w, h):
@@ -48,10 +26,11 @@ def draw_v15_transparent(x, y, w, h):
         return fg
     return (0, 0, 0, 0)
 
-with open('assets/images/app_icon.png', 'wb') as f:
-    f.write(make_png(1024, 1024, draw_v15_solid))
+if __name__ == '__main__':
+    with open('assets/images/app_icon.png', 'wb') as f:
+        f.write(make_png(1024, 1024, draw_v15_solid, indexed=True))
 
-with open('assets/images/app_icon_foreground.png', 'wb') as f:
-    f.write(make_png(1024, 1024, draw_v15_transparent, is_rgba=True))
+    with open('assets/images/app_icon_foreground.png', 'wb') as f:
+        f.write(make_png(1024, 1024, draw_v15_transparent, is_rgba=True, indexed=True))
 
-print("V15 Final Icons Generated.")
+    print("V15 Final Icons Generated.")
@@ -0,0 +1,182 @@
+import argparse
+import os
+import re
+import sys
+
+from build_assets import ROOT, load_manifest
+
+# Which bundled images does anything use? The Flutter asset bundle is what
+# pubspec.yaml's `flutter: assets:` list declares (a directory entry bundles
+# the files directly inside it, plus resolution variants in 2.0x/, 3.0x/, ...).
+# References are collected from:
+#
+#   runtime    string literals in lib/ (Image.asset, AssetImage, ...)
+#   build      pubspec.yaml tool settings (flutter_launcher_icons,
+#              flutter_native_splash); these read the file at build time and
+#              do not need it in the bundle
+#   platform   text files in the platform folders that name the file
+#   test       test/ (informational: tests alone do not keep an asset)
+#
+# A bundled image with no runtime reference only costs bundle size. Asset
+# paths built at runtime ('assets/images/$name') cannot be resolved; they are
+# listed as dynamic and make the trimmed list unsafe.
+
+PUBSPEC_PATH = os.path.join(ROOT, 'pubspec.yaml')
+PLATFORM_DIRS = ['android', 'ios', 'web', 'macos', 'windows', 'linux']
+TEXT_EXTENSIONS = {'.dart', '.kt', '.java', '.swift', '.m', '.xml', '.plist', '.json', '.html', '.js', '.rc',
+                   '.cc', '.cpp', '.h', '.gradle', '.kts', '.yaml', '.storyboard', '.xib', '.pbxproj', '.cmake'}
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.gif', '.svg')
+VARIANT_DIR = re.compile(r'\d+(\.\d+)?x')
+STRING_LITERAL = re.compile(r"""(['"])((?:(?!\1).)*?)\1""")
+
+def bundle_entries(path=PUBSPEC_PATH):
+    # The `assets:` list of the top-level `flutter:` section
+    entries = []
+    section = None
+    in_assets = False
+    with open(path) as f:
+        for line in f:
+            stripped = line.split('#')[0].rstrip()
+            if not stripped:
+                continue
+            indent = len(stripped) - len(stripped.lstrip())
+            if indent == 0:
+                section = stripped.rstrip(':')
+                in_assets = False
+            elif section == 'flutter' and stripped.strip() == 'assets:':
+                in_assets = True
+            elif in_assets and stripped.strip().startswith('- '):
+                entries.append(stripped.strip()[2:].strip('\'"'))
+            elif in_assets:
+                in_assets = False
+    return entries
+
+def bundled_files(entries, root=ROOT):
+    # -> {asset path: [file paths relative to root]}, variants included
+    files = {}
+    for entry in entries:
+        if entry.endswith('/'):
+            directory = os.path.join(root, entry)
+            if not os.path.isdir(directory):
+                continue
+            for name in sorted(os.listdir(directory)):
+                if os.path.isfile(os.path.join(directory, name)):
+                    files[entry + name] = [entry + name]
+            for name in sorted(os.listdir(directory)):
+                if VARIANT_DIR.fullmatch(name) and os.path.isdir(os.path.join(directory, name)):
+                    for variant in sorted(os.listdir(os.path.join(directory, name))):
+                        files.setdefault(entry + variant, []).append(f'{entry}{name}/{variant}')
+        elif os.path.isfile(os.path.join(root, entry)):
+            files[entry] = [entry]
+    return files
+
+def source_files(directory, extensions=TEXT_EXTENSIONS):
+    for dirpath, dirnames, filenames in os.walk(directory):
+        dirnames[:] = [d for d in dirnames if not d.startswith('.') and d not in ('build', 'Pods')]
+        for name in filenames:
+            if os.path.splitext(name)[1] in extensions:
+                yield os.path.join(dirpath, name)
+
+def literal_references(path, root=ROOT):
+    # -> [(string literal, 'file:line')] of literals that look like image paths
+    found = []
+    with open(path, encoding='utf-8', errors='replace') as f:
+        for lineno, line in enumerate(f, 1):
+            for _, value in STRING_LITERAL.findall(line):
+                if 'assets/' in value or value.lower().endswith(IMAGE_EXTENSIONS):
+                    found.append((value, f"{os.path.relpath(path, root)}:{lineno}"))
+    return found
+
+def pubspec_references(path=PUBSPEC_PATH):
+    # -> [(value, 'section.key.subkey')] of image paths in tool settings
+    found = []
+    parents = []   # (indent, key) of the mappings the current line is nested in
+    with open(path) as f:
+        for line in f:
+            stripped = line.split('#')[0].rstrip()
+            match = re.match(r'(\s*)([\w-]+):\s*[\'"]?([^\'"\s]*)', stripped)
+            if not match:
+                continue
+            indent, key, value = len(match.group(1)), match.group(2), match.group(3)
+            while parents and parents[-1][0] >= indent:
+                parents.pop()
+            keys = [k for _, k in parents] + [key]
+            if not value:
+                parents.append((indent, key))
+            elif keys[0] != 'flutter' and value.lower().endswith(IMAGE_EXTENSIONS):
+                found.append((value, '.'.join(keys)))
+    return found
+
+def collect_references(assets, root=ROOT):
+    # -> ({asset: [(kind, where)]}, [dynamic 'file:line'])
+    by_asset = {asset: [] for asset in assets}
+    by_name = {}
+    for asset in assets:
+        by_name.setdefault(os.path.basename(asset), []).append(asset)
+    dynamic = []
+
+    def match(value, kind, where):
+        if value in by_asset:
+            by_asset[value].append((kind, where))
+        elif '$' in value or value.endswith('/'):
+            if kind == 'runtime' and 'assets/' in value:
+                dynamic.append(f"{where} {value!r}")
+        else:
+            for asset in by_name.get(os.path.basename(value), []):
+                by_asset[asset].append((kind, where))
+
+    for kind, directories in (('runtime', ['lib']), ('test', ['test']), ('platform', PLATFORM_DIRS)):
+        for directory in directories:
+            for path in source_files(os.path.join(root, directory)):
+                for value, where in literal_references(path, root):
+                    match(value, kind, where)
+    for value, where in pubspec_references(os.path.join(root, 'pubspec.yaml')):
+        match(value, 'build', f"pubspec.yaml {where}")
+    return by_asset, dynamic
+
+def main():
+    parser = argparse.ArgumentParser(description="Report bundled images that nothing references and what they cost")
+    parser.add_argument('--trimmed', action='store_true',
+                        help="print a pubspec.yaml assets list with only the runtime-referenced images")
+    parser.add_argument('--verbose', action='store_true', help="list every reference")
+    args = parser.parse_args()
+
+    files = bundled_files(bundle_entries())
+    references, dynamic = collect_references(files)
+    generated = {asset['output'] for asset in load_manifest()}
+    total = unused = build_only = 0
+    keep = []
+    for asset, paths in files.items():
+        size = sum(os.path.getsize(os.path.join(ROOT, p)) for p in paths)
+        total += size
+        kinds = {kind for kind, _ in references[asset]}
+        if 'runtime' in kinds:
+            status = "used"
+            keep.append(asset)
+        elif 'build' in kinds or 'platform' in kinds:
+            status = "build-time only"
+            build_only += size
+        else:
+            status = "UNUSED"
+            unused += size
+        note = ", generated by asset_manifest.json" if asset in generated else ""
+        print(f"{size:>10,} B  {status:<15} {asset}{note}")
+        if args.verbose:
+            for kind, where in references[asset]:
+                print(f"{'':>29}{kind:<9} {where}")
+
+    print(f"\nBundled: {len(files)} images, {total:,} bytes")
+    print(f"Unreferenced: {unused:,} bytes; referenced only by build tools: {build_only:,} bytes "
+          f"({(unused + build_only) / total:.0%} of the bundle could go)" if total else "Nothing bundled")
+    for where in dynamic:
+        print(f"WARNING dynamic asset path, trimming may drop files it loads: {where}")
+
+    if args.trimmed:
+        print("\n  assets:")
+        for asset in keep:
+            print(f"    - {asset}")
+        if dynamic:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
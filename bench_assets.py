@@ -0,0 +1,175 @@
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+
+from build_assets import load_manifest
+from parallel_render import load_draw
+from png_encoder import CHANNELS, encode_png, render_rows
+from separable import wrap_draw
+from supersample import SAMPLING, uniform_rows
+
+# Benchmarks for the asset generators. Every case (asset x canvas size x
+# samples per pixel) runs in a freshly spawned process, so its peak RSS is its
+# own and not the high-water mark of earlier cases. Rendering and encoding are
+# timed separately; the best of --repeat runs is kept.
+#
+#   python bench_assets.py --out bench.json
+#   python bench_assets.py --baseline bench.json --max-slowdown 0.15 --max-growth 0.01
+#
+# Comparison exits with status 1 when a case's pixels/sec drops, or its PNG
+# grows, by more than the given fraction.
+
+class CountingDraw:
+    # Counts sample evaluations of a draw function; .draw keeps its bounds
+    # and separable split, so the benchmark runs the loop that ships
+    def __init__(self, draw_func):
+        self.calls = 0
+        self.draw = wrap_draw(draw_func, self.counting)
+
+    def counting(self, func, sample):
+        if not sample:
+            return func
+
+        def counted(*args):
+            self.calls += 1
+            return func(*args)
+        return counted
+
+def case_sampling(asset, samples):
+    # (ss, offset, empty) for a samples-per-pixel count, or None for one plain sample
+    if samples is None:
+        return SAMPLING[asset['sampling']] if asset.get('sampling') else None
+    if samples == 1:
+        return None
+    base = SAMPLING.get(asset.get('sampling'), (1, 0.5, (0, 0, 0, 0)))
+    return (math.isqrt(samples), base[1], base[2])
+
+def run_case(case):
+    asset, size, samples, repeat = case
+    sampling = case_sampling(asset, samples)
+    best_render = best_encode = None
+    for _ in range(repeat):
+        counter = CountingDraw(load_draw(asset['draw']))
+        draw = counter.draw
+        start = time.perf_counter()
+        if sampling is None:
+            color_type = asset['color_type']
+            rows = [bytes(row) for row in render_rows(size, size, draw, CHANNELS[color_type])]
+        else:
+            color_type = 6
+            rows = [bytes(row) for row in uniform_rows(size, size, draw, *sampling)]
+        render_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        png = encode_png(size, size, rows, color_type, asset.get('level', -1), asset.get('filter_mode', 'none'),
+                         asset.get('strategy', 'default'))
+        encode_time = time.perf_counter() - start
+        best_render = render_time if best_render is None else min(best_render, render_time)
+        best_encode = encode_time if best_encode is None else min(best_encode, encode_time)
+
+    pixels = size * size
+    return {
+        'asset': os.path.basename(asset['output']),
+        'size': size,
+        'samples': 1 if sampling is None else sampling[0] ** 2,
+        'pixels': pixels,
+        'draw_calls': counter.calls,
+        'render_seconds': round(best_render, 4),
+        'encode_seconds': round(best_encode, 4),
+        'pixels_per_second': round(pixels / (best_render + best_encode)),
+        # ru_maxrss is in KiB on Linux
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'output_bytes': len(png),
+    }
+
+def run_benchmarks(assets, sizes, sample_counts, repeat=3):
+    cases = []
+    for asset in assets:
+        for size in sizes:
+            for samples in sample_counts:
+                # Opaque RGB designs have no alpha to supersample
+                if samples not in (None, 1) and asset['color_type'] == 2 and not asset.get('sampling'):
+                    continue
+                cases.append((asset, size, samples, repeat))
+    context = multiprocessing.get_context('spawn')
+    results = []
+    with context.Pool(1, maxtasksperchild=1) as pool:
+        for result in pool.imap(run_case, cases):
+            print(f"{result['asset']:<34} {result['size']:>5}px {result['samples']:>3}x  "
+                  f"{result['pixels_per_second']:>10,} px/s  {result['draw_calls']:>11,} calls  "
+                  f"render {result['render_seconds']:>7.2f}s  encode {result['encode_seconds']:>6.3f}s  "
+                  f"{result['peak_rss_kb'] // 1024:>4} MiB  {result['output_bytes']:>8,} B")
+            results.append(result)
+    return results
+
+def case_key(result):
+    return (result['asset'], result['size'], result['samples'])
+
+def compare(baseline, results, max_slowdown, max_growth):
+    # -> list of regression messages
+    previous = {case_key(r): r for r in baseline}
+    regressions = []
+    for result in results:
+        old = previous.get(case_key(result))
+        if old is None:
+            continue
+        name = f"{result['asset']} @ {result['size']}px x{result['samples']}"
+        speed = result['pixels_per_second'] / old['pixels_per_second']
+        if speed < 1 - max_slowdown:
+            regressions.append(f"{name}: {speed - 1:+.1%} pixels/sec "
+                               f"({old['pixels_per_second']:,} -> {result['pixels_per_second']:,})")
+        growth = result['output_bytes'] / old['output_bytes']
+        if growth > 1 + max_growth:
+            regressions.append(f"{name}: {growth - 1:+.1%} output bytes "
+                               f"({old['output_bytes']:,} -> {result['output_bytes']:,})")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the asset generators (draw function + PNG encoder)")
+    parser.add_argument('assets', nargs='*', help="asset file names (default: all in asset_manifest.json)")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[128, 256], help="canvas sizes")
+    parser.add_argument('--samples', type=int, nargs='+',
+                        help="samples per pixel, square numbers (default: each asset's own sampling)")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per case, best time is kept")
+    parser.add_argument('--out', help="write the results to this JSON file")
+    parser.add_argument('--baseline', help="JSON file from an earlier run to compare against")
+    parser.add_argument('--max-slowdown', type=float, default=0.10, help="allowed pixels/sec drop (fraction)")
+    parser.add_argument('--max-growth', type=float, default=0.0, help="allowed output size growth (fraction)")
+    args = parser.parse_args()
+
+    for samples in args.samples or []:
+        if math.isqrt(samples) ** 2 != samples:
+            parser.error(f"--samples {samples} is not a square number")
+    assets = [a for a in load_manifest() if not args.assets or os.path.basename(a['output']) in args.assets]
+    results = run_benchmarks(assets, args.sizes, args.samples or [None], args.repeat)
+
+    if args.out:
+        report = {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'results': results,
+        }
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(baseline, results, args.max_slowdown, args.max_growth)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import time
+
+from parallel_render import load_draw, render_parallel
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+MANIFEST_PATH = os.path.join(ROOT, 'asset_manifest.json')
+CACHE_PATH = os.path.join(ROOT, '.asset_cache.json')
+# Changes to these invalidate every cached asset
+RENDERER_MODULES = ['culling.py', 'supersample.py', 'separable.py', 'png_encoder.py', 'parallel_render.py']
+
+# asset_manifest.json lists every generated asset. Keys per entry:
+#   output      path relative to the repo root
+#   draw        'module:function' of the scalar draw function
+#   size        canvas width and height in pixels
+#   color_type  2 (RGB) or 6 (RGBA)
+#   sampling    optional supersampling scheme from supersample.SAMPLING ('hq', 'v5')
+#   adaptive    optional, refine edge pixels only (see supersample.adaptive_rows)
+#   level, filter_mode, strategy   optional encoder settings (see png_encoder)
+#   indexed     optional, write a palette PNG (1/2/4/8-bit) when that is smaller
+#   protect     optional, the checked-in file is other artwork: it is only
+#               replaced with --force (every other output is generated)
+
+def load_manifest(path=MANIFEST_PATH):
+    with open(path) as f:
+        return json.load(f)['assets']
+
+def load_cache():
+    try:
+        with open(CACHE_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_cache(cache):
+    with open(CACHE_PATH, 'w') as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+
+def file_digest(path):
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+def renderer_version():
+    # Digest of the modules every render goes through
+    digest = hashlib.sha256()
+    for name in RENDERER_MODULES:
+        with open(os.path.join(ROOT, name), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+def asset_hash(entry):
+    # Source of the draw function and its declared bounds, the renderer
+    # modules, plus every parameter of the entry
+    draw_func = load_draw(entry['draw'])
+    parts = [inspect.getsource(draw_func)]
+    if getattr(draw_func, 'bounds', None) is not None:
+        parts += [inspect.getsource(draw_func.bounds), repr(draw_func.background)]
+    parts += [renderer_version(), json.dumps(entry, sort_keys=True)]
+    return hashlib.sha256('\n'.join(parts).encode()).hexdigest()
+
+def is_protected(entry, png):
+    # Writing png would replace checked-in artwork the manifest protects
+    digest = file_digest(os.path.join(ROOT, entry['output']))
+    return entry.get('protect', False) and digest is not None and digest != hashlib.sha256(png).hexdigest()
+
+def render_entry(entry, workers=None):
+    return render_parallel(
+        entry['size'], entry['size'], load_draw(entry['draw']),
+        color_type=entry['color_type'],
+        sampling=entry.get('sampling'),
+        adaptive=entry.get('adaptive', False),
+        workers=workers,
+        level=entry.get('level', -1),
+        filter_mode=entry.get('filter_mode', 'none'),
+        strategy=entry.get('strategy', 'default'),
+        indexed=entry.get('indexed', False),
+    )
+
+def build(entries, force=False, workers=None, dry_run=False):
+    cache = load_cache()
+    for entry in entries:
+        output = entry['output']
+        path = os.path.join(ROOT, output)
+        key = asset_hash(entry)
+        record = cache.get(output)
+        digest = file_digest(path)
+        if not force and record and record['hash'] == key and record['digest'] == digest:
+            print(f"{output}: {'kept (protected)' if record.get('protected') else 'up to date'}")
+            continue
+        if dry_run:
+            print(f"{output}: would rebuild")
+            continue
+
+        start = time.perf_counter()
+        png = render_entry(entry, workers)
+        new_digest = hashlib.sha256(png).hexdigest()
+        if new_digest == digest:
+            status = "unchanged"
+        elif is_protected(entry, png) and not force:
+            # Never clobber protected artwork; remember it so later runs skip
+            # it until the draw function or file changes
+            cache[output] = {'hash': key, 'digest': digest, 'protected': True}
+            save_cache(cache)
+            print(f"{output}: protected in the manifest and differs from the render; kept (use --force to overwrite)")
+            continue
+        else:
+            with open(path, 'wb') as f:
+                f.write(png)
+            status = "rebuilt"
+        cache[output] = {'hash': key, 'digest': new_digest}
+        save_cache(cache)
+        print(f"{output}: {status} ({time.perf_counter() - start:.2f}s)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the generated assets listed in asset_manifest.json")
+    parser.add_argument('outputs', nargs='*', help="only these outputs (default: all)")
+    parser.add_argument('--force', action='store_true', help="ignore the cache and overwrite protected files")
+    parser.add_argument('--workers', type=int, help="render processes per asset")
+    parser.add_argument('--dry-run', action='store_true', help="only list what would be rebuilt")
+    args = parser.parse_args()
+
+    entries = [e for e in load_manifest() if not args.outputs or e['output'] in args.outputs
+               or os.path.basename(e['output']) in args.outputs]
+    build(entries, args.force, args.workers, args.dry_run)
+
+if __name__ == '__main__':
+    main()
@@ -1,54 +1,38 @@
 
-import struct
-import zlib
+import argparse
+
+from png_encoder import png_files
+from png_reader import alpha_stats
+
+COLOR_TYPES = {0: 'gray', 2: 'RGB', 3: 'palette', 4: 'gray+alpha', 6: 'RGBA'}
 
 def check_transparency(filename):
     try:
-        with open(filename, 'rb') as f:
-            signature = f.read(8)
-            if signature != b'\x89PNG\r\n\x1a\n':
-                print(f"{filename} is not a valid PNG")
-                return
+        stats = alpha_stats(filename)
+    except (ValueError, OSError) as e:
+        print(f"{filename}: {e}")
+        return None
+
+    total = stats['width'] * stats['height']
+    print(f"{filename}")
+    print(f"  Dimensions: {stats['width']}x{stats['height']}, "
+          f"Color Type: {stats['color_type']} ({COLOR_TYPES[stats['color_type']]}), "
+          f"Bit Depth: {stats['bit_depth']}, IDAT chunks: {stats['idat_chunks']}")
+    print(f"  Transparent: {stats['transparent']:,} ({stats['transparent'] / total:.1%}), "
+          f"Opaque: {stats['opaque']:,} ({stats['opaque'] / total:.1%}), "
+          f"Partial: {stats['partial']:,} ({stats['partial'] / total:.1%})")
+    if stats['bbox'] is None:
+        print("  Content: fully transparent")
+    else:
+        left, top, right, bottom = stats['bbox']
+        print(f"  Content bbox: ({left}, {top})-({right}, {bottom}), "
+              f"{right - left + 1}x{bottom - top + 1}")
+    return stats
 
-            while True:
-                chunk_header = f.read(8)
-                if not chunk_header:
-                    break
-                length, chunk_type = struct.unpack('!I4s', chunk_header)
-                
-                if chunk_type == b'IHDR':
-                    data = f.read(length)
-                    width, height, bit_depth, color_type, _, _, _ = struct.unpack('!IIBBBBB', data)
-                    print(f"Dimensions: {width}x{height}, Color Type: {color_type}")
-                    if color_type != 6:
-                        print("Not an RGBA PNG.")
-                        return
-                    f.read(4) # CRC
-                elif chunk_type == b'IDAT':
-                    compressed_data = f.read(length)
-                    data = zlib.decompress(compressed_data)
-                    # Check first few pixels' alpha
-                    # Each row has a filter byte (1 byte)
-                    # RGBA = 4 bytes per pixel
-                    has_transparency = False
-                    for i in range(0, len(data), 4 * 100 + 1): # sample
-                        row = data[i+1:i+1+4*10]
-                        for j in range(3, len(row), 4):
-                            if row[j] < 255:
-                                has_transparency = True
-                                break
-                        if has_transparency: break
-                    
-                    if has_transparency:
-                        print("Transparent pixels found.")
-                    else:
-                        print("No transparent pixels found in sample.")
-                    f.read(4) # CRC
-                elif chunk_type == b'IEND':
-                    break
-                else:
-                    f.seek(length + 4, 1)
-    except Exception as e:
-        print(f"Error: {e}")
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Report exact alpha statistics for PNG files")
+    parser.add_argument('paths', nargs='*', default=['assets/images'], help="PNG files or directories")
+    args = parser.parse_args()
 
-check_transparency('/Users/jw/workspace/coffee-note-app/assets/images/app_icon_v9_python.png')
+    for path in png_files(args.paths):
+        check_transparency(path)
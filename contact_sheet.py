@@ -0,0 +1,177 @@
+import argparse
+import itertools
+import math
+import multiprocessing
+import os
+import time
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from build_assets import load_manifest
+from parallel_render import load_draw
+from supersample import SAMPLING
+from themes import splash_colors
+from vector_render import encode_array, render_array, supersample_array
+from vectorize import Unsupported, vectorize
+
+# Batch renderer for design candidates. Every draw function, times every
+# combination of the --sweep values, is rendered as a small preview and the
+# previews are laid out in one numbered contact sheet:
+#
+#   python contact_sheet.py create_identity_icons:draw_v15 --sweep slit_w=8,12,16
+#   python contact_sheet.py create_v5_splash:draw_legendary_coffee_v5 --size 1024 \
+#       --sweep s=0.5,0.55,0.6 --sweep steam_amp=0.08,0.12,0.16 --pick 4
+#
+# A sweep replaces the value assigned to a local name in the draw
+# function (see vectorize.compile_draw). Previews sample the design's full
+# canvas on a coarse grid, which every candidate of a worker shares. --pick
+# renders the chosen candidate numbers at full size.
+
+DEFAULT_DRAWS = ['create_identity_icons:draw_v15', 'create_identity_icons:draw_v16', 'create_identity_icons:draw_v17']
+LABEL_HEIGHT = 14
+PADDING = 8
+SHEET_BACKGROUND = (18, 18, 18)
+
+def number(text):
+    # '12' -> 12, '0.5' / '1e-3' -> float
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+def parse_sweep(value):
+    name, _, values = value.partition('=')
+    try:
+        numbers = [number(v) for v in values.split(',')]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected name=v1,v2,..., got {value!r}")
+    if not name or not numbers:
+        raise argparse.ArgumentTypeError(f"expected name=v1,v2,..., got {value!r}")
+    return name, numbers
+
+def candidates(draws, sweeps):
+    # -> [(spec, overrides)], every draw with every combination of sweep values
+    names = [name for name, _ in sweeps]
+    combinations = list(itertools.product(*(values for _, values in sweeps)))
+    return [(spec, dict(zip(names, values))) for spec in draws for values in combinations]
+
+def candidate_label(spec, overrides, with_name=True):
+    parts = [f"{k}={v}" for k, v in overrides.items()]
+    return ' '.join([spec.split(':')[1]] + parts if with_name or not parts else parts)
+
+@lru_cache(maxsize=None)
+def preview_grids(size, preview, ss):
+    # ss x ss sample grids of a `preview` px render of a `size` px canvas
+    step = size / preview
+    grids = []
+    for sy in range(ss):
+        for sx in range(ss):
+            x = (np.arange(preview, dtype=np.float64)[np.newaxis, :] + sx / ss) * step
+            y = (np.arange(preview, dtype=np.float64)[:, np.newaxis] + sy / ss) * step
+            grids.append((x, y))
+    return grids
+
+def render_preview(job):
+    spec, overrides, size, preview, ss = job
+    return preview_pixels(vectorize(load_draw(spec), overrides), size, preview, ss)
+
+def preview_pixels(draw, size, preview, ss):
+    # `preview` px render of a vectorized draw on a `size` px canvas
+    total = None
+    for x, y in preview_grids(size, preview, ss):
+        sample = draw(x, y, size, size).astype(np.float64)
+        if sample.shape[2] == 4:
+            # Premultiplied, so transparent samples do not darken edges
+            sample[..., :3] *= sample[..., 3:] / 255
+        total = sample if total is None else total + sample
+    total /= ss * ss
+    if total.shape[2] == 4:
+        alpha = total[..., 3:]
+        total[..., :3] = np.divide(total[..., :3] * 255, alpha, out=np.zeros_like(total[..., :3]), where=alpha > 0)
+    return np.rint(total).astype(np.uint8)
+
+def tile(pixels, backdrop):
+    # Transparent designs are shown over the splash background
+    if pixels.shape[2] == 3:
+        return pixels
+    alpha = pixels[..., 3:] / 255
+    return np.rint(pixels[..., :3] * alpha + np.asarray(backdrop) * (1 - alpha)).astype(np.uint8)
+
+def contact_sheet(previews, labels, columns, backdrop):
+    preview = previews[0].shape[0]
+    rows = math.ceil(len(previews) / columns)
+    cell_w, cell_h = preview + PADDING, preview + LABEL_HEIGHT + PADDING
+    sheet = np.empty((rows * cell_h + PADDING, columns * cell_w + PADDING, 3), dtype=np.uint8)
+    sheet[...] = SHEET_BACKGROUND
+    for i, pixels in enumerate(previews):
+        top, left = PADDING + (i // columns) * cell_h, PADDING + (i % columns) * cell_w
+        sheet[top:top + preview, left:left + preview] = tile(pixels, backdrop)
+    image = Image.fromarray(sheet)
+    text = ImageDraw.Draw(image)
+    for i, label in enumerate(labels):
+        top, left = PADDING + (i // columns) * cell_h, PADDING + (i % columns) * cell_w
+        text.text((left, top + preview + 2), f"#{i} {label}"[:preview // 6], fill=(230, 230, 230))
+    return np.asarray(image)
+
+def main():
+    parser = argparse.ArgumentParser(description="Render design candidates and parameter sweeps into a contact sheet")
+    parser.add_argument('draws', nargs='*', default=DEFAULT_DRAWS, help="module:function (default: identity icons)")
+    parser.add_argument('--sweep', action='append', type=parse_sweep, default=[], metavar='NAME=V1,V2,...',
+                        help="values for a local name of the draw functions, e.g. slit_w=8,12,16")
+    parser.add_argument('--size', type=int, default=1024, help="design canvas size")
+    parser.add_argument('--preview', type=int, default=192, help="preview tile size")
+    parser.add_argument('--ss', type=int, default=2, help="preview samples per axis")
+    parser.add_argument('--columns', type=int, help="tiles per row (default: about square)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--out', default='build/candidates', help="output directory")
+    parser.add_argument('--pick', type=int, nargs='+', default=[], metavar='N',
+                        help="also render these candidate numbers at full size")
+    args = parser.parse_args()
+
+    jobs = candidates(args.draws, args.sweep)
+    labels = [candidate_label(spec, overrides) for spec, overrides in jobs]
+    for spec, overrides in jobs:
+        # Fail before starting workers when a sweep does not apply
+        try:
+            vectorize(load_draw(spec), overrides)
+        except (Unsupported, ValueError) as e:
+            parser.error(f"{spec}: {e}")
+
+    start = time.perf_counter()
+    with multiprocessing.Pool(args.workers) as pool:
+        previews = pool.map(render_preview, [(spec, overrides, args.size, args.preview, args.ss)
+                                             for spec, overrides in jobs],
+                            chunksize=max(1, len(jobs) // (4 * args.workers)))
+    columns = args.columns or math.ceil(math.sqrt(len(previews)))
+    # With a single draw function the tiles only need the swept values
+    tile_labels = [candidate_label(spec, overrides, len(args.draws) > 1) for spec, overrides in jobs]
+    sheet = contact_sheet(previews, tile_labels, columns, splash_colors()[0])
+    os.makedirs(args.out, exist_ok=True)
+    path = os.path.join(args.out, 'contact_sheet.png')
+    with open(path, 'wb') as f:
+        f.write(encode_array(sheet, 9))
+    print(f"Created {path}: {len(jobs)} candidates in {time.perf_counter() - start:.2f}s")
+    for i, label in enumerate(labels):
+        print(f"  #{i:<3} {label}")
+
+    sampling = {asset['draw']: asset.get('sampling') for asset in load_manifest()}
+    for i in args.pick:
+        if not 0 <= i < len(jobs):
+            parser.error(f"--pick {i}: there are {len(jobs)} candidates")
+        spec, overrides = jobs[i]
+        start = time.perf_counter()
+        draw = vectorize(load_draw(spec), overrides)
+        if sampling.get(spec):
+            # Supersampled like the shipped asset
+            pixels = supersample_array(args.size, args.size, draw, SAMPLING[sampling[spec]])
+        else:
+            pixels = render_array(args.size, args.size, draw)
+        path = os.path.join(args.out, labels[i].replace(' ', '_').replace('=', '') + '.png')
+        with open(path, 'wb') as f:
+            f.write(encode_array(pixels, 9))
+        print(f"Created {path} ({time.perf_counter() - start:.2f}s)")
+
+if __name__ == '__main__':
+    main()
@@ -1,27 +1,16 @@
 
-import zlib
-import struct
 import math
 
-def make_png(width, height, draw_func):
-    png = b'\x89PNG\r\n\x1a\n'
-    ihdr_content = struct.pack('!IIBBBBB', width, height, 8, 6, 0, 0, 0)
-    ihdr = b'IHDR' + ihdr_content
-    png += struct.pack('!I', len(ihdr_content)) + ihdr + struct.pack('!I', zlib.crc32(ihdr) & 0xFFFFFFFF)
+from culling import bounded, scaled_boxes
+from png_encoder import make_png
 
-    raw_data = b''
-    for y in range(height):
-        raw_data += b'\x00'
-        for x in range(width):
-            raw_data += bytes(draw_func(x, y, width, height))
-    
-    compressor = zlib.compressobj()
-    idat_data = compressor.compress(raw_data) + compressor.flush()
-    idat = b'IDAT' + idat_data
-    png += struct.pack('!I', len(idat_data)) + idat + struct.pack('!I', zlib.crc32(idat) & 0xFFFFFFFF)
-    png += struct.pack('!I', 0) + b'IEND' + struct.pack('!I', zlib.crc32(b'IEND') & 0xFFFFFFFF)
-    return png
+def option1_bounds(w, h):
+    # Cup and handle / steam and nib, in the nx, ny space of
+    # draw_option1_refined with some margin
+    return scaled_boxes([(-0.85, -0.3, 1.15, 0.6), (-0.4, -1.1, 0.25, -0.05)],
+                        w/2, h/2 * 1.1, w * 0.55 / 2, h * 0.55 / 2)
 
+@bounded(option1_bounds, (0, 0, 0, 0))
 def draw_option1_refined(x, y, w, h):
     cx, cy = w/2, h/2 * 1.1 # Lower a bit for steam
     dx, dy = x - cx, y - cy
@@ -47,12 +36,13 @@ def draw_option1_refined(x, y, w, h):
 
     # 3. Steam Line with Pen Nib
     # Curved line
-    sdx = nx - 0.15 * math.sin((ny + 0.5) * 4)
+    steam_amp = 0.15
+    sdx = nx - steam_amp * math.sin((ny + 0.5) * 4)
     if -0.9 < ny < -0.1:
         if abs(sdx) < 0.04: return white
     
     # Pen Nib at the top
-    ndx, ndy = nx - 0.15 * math.sin((-0.9 + 0.5) * 4), ny + 0.95
+    ndx, ndy = nx - steam_amp * math.sin((-0.9 + 0.5) * 4), ny + 0.95
     if abs(ndx) < 0.2 and -0.1 < ndy < 0.3:
         # Nib triangle
         width_at_y = 0.18 * (1 - (ndy + 0.1) / 0.45)
@@ -65,6 +55,7 @@ def draw_option1_refined(x, y, w, h):
 
     return trans
 
-with open('/Users/jw/workspace/coffee-note-app/assets/images/splash_logo_final.png', 'wb') as f:
-    f.write(make_png(512, 512, draw_option1_refined))
-print("Created splash_logo_final.png")
+if __name__ == '__main__':
+    with open('assets/images/splash_logo_final.png', 'wb') as f:
+        f.write(make_png(512, 512, draw_option1_refined, is_rgba=True))
+    print("Created splash_logo_final.png")
@@ -1,52 +1,30 @@
 
-import zlib
-import struct
+import argparse
 import math
 
-def make_png_high_quality(width, height, draw_func):
-    # RGBA PNG with quality anti-aliasing via supersampling
-    supersample = 2 # 2x2 samples per pixel
-    
-    png = b'\x89PNG\r\n\x1a\n'
-    ihdr_content = struct.pack('!IIBBBBB', width, height, 8, 6, 0, 0, 0)
-    ihdr = b'IHDR' + ihdr_content
-    png += struct.pack('!I', len(ihdr_content)) + ihdr + struct.pack('!I', zlib.crc32(ihdr) & 0xFFFFFFFF)
+from culling import bounded, scaled_boxes
+from png_encoder import encode_png
+from supersample import SAMPLING, adaptive_rows, uniform_rows
 
-    raw_data = b''
-    for y in range(height):
-        if y % 100 == 0: print(f"Processing row {y}...")
-        raw_data += b'\x00' # Filter type
-        for x in range(width):
-            # Supersampling
-            r, g, b_val, a = 0, 0, 0, 0
-            for sy in range(supersample):
-                for sx in range(supersample):
-                    px = x + sx/supersample
-                    py = y + sy/supersample
-                    cr, cg, cb, ca = draw_func(px, py, width, height)
-                    # Blend based on alpha
-                    r += cr * (ca/255)
-                    g += cg * (ca/255)
-                    b_val += cb * (ca/255)
-                    a += ca
-            
-            samples = supersample * supersample
-            avg_a = int(a / samples)
-            if avg_a > 0:
-                avg_r = int(r / (a/255)) if a > 0 else 0
-                avg_g = int(g / (a/255)) if a > 0 else 0
-                avg_b = int(b_val / (a/255)) if a > 0 else 0
-                raw_data += bytes([avg_r, avg_g, avg_b, avg_a])
-            else:
-                raw_data += bytes([0, 0, 0, 0])
-    
-    compressor = zlib.compressobj()
-    idat_data = compressor.compress(raw_data) + compressor.flush()
-    idat = b'IDAT' + idat_data
-    png += struct.pack('!I', len(idat_data)) + idat + struct.pack('!I', zlib.crc32(idat) & 0xFFFFFFFF)
-    png += struct.pack('!I', 0) + b'IEND' + struct.pack('!I', zlib.crc32(b'IEND') & 0xFFFFFFFF)
-    return png
+def report_progress(y):
+    if y % 100 == 0: print(f"Processing row {y}...")
 
+def make_png_high_quality(width, height, draw_func, adaptive=False, max_samples=4):
+    if adaptive:
+        # Refine only edge pixels, up to max_samples per pixel
+        rows = adaptive_rows(width, height, draw_func, max_samples, offset=0.0, empty=(0, 0, 0, 0))
+    else:
+        rows = uniform_rows(width, height, draw_func, *SAMPLING['hq'], progress=report_progress)
+    return encode_png(width, height, rows, color_type=6)
+
+def v4_bounds(w, h):
+    # Cup, handle and saucer / steam and nib, in the nx, ny space of
+    # draw_premium_cup_v4 with some margin; the steam box holds the
+    # steam and nib at every steam_phase
+    return scaled_boxes([(-0.9, -0.35, 1.25, 0.75), (-0.4, -1.4, 0.4, -0.5)],
+                        w/2, h/2 * 1.12, w * 0.52 / 2, h * 0.52 / 2)
+
+@bounded(v4_bounds, (0, 0, 0, 0))
 def draw_premium_cup_v4(x, y, w, h):
     cx, cy = w/2, h/2 * 1.12
     dx, dy = x - cx, y - cy
@@ -77,15 +55,17 @@ def draw_premium_cup_v4(x, y, w, h):
 
     # Steam / Pen Nib
     # S-curve steam
+    steam_amp = 0.15
+    steam_phase = 0.0  # animated by steam_animation.py
     steam_y = ny + 0.55
     if -0.8 < steam_y < 0:
         # Offset x based on sine
-        off_x = 0.15 * math.sin(steam_y * 5)
+        off_x = steam_amp * math.sin(steam_y * 5 + steam_phase)
         if abs(nx - off_x) < 0.03: # Thinner line for elegance
             return white
             
     # Professional Pen Nib at top
-    pdx, pdy = nx - 0.15 * math.sin(-0.8 * 5), ny + 0.95
+    pdx, pdy = nx - steam_amp * math.sin(-0.8 * 5 + steam_phase), ny + 0.95
     if abs(pdx) < 0.2 and -0.15 < pdy < 0.35:
         # Nib shape
         width_at_y = 0.2 * (1 - (pdy + 0.15) / 0.5)
@@ -98,6 +78,12 @@ def draw_premium_cup_v4(x, y, w, h):
 
     return trans
 
-with open('/Users/jw/workspace/coffee-note-app/assets/images/splash_v4_final_premium.png', 'wb') as f:
-    f.write(make_png_high_quality(1024, 1024, draw_premium_cup_v4))
-print("Created splash_v4_final_premium.png")
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--adaptive', action='store_true', help="supersample edge pixels only")
+    parser.add_argument('--max-samples', type=int, default=4)
+    args = parser.parse_args()
+
+    with open('assets/images/splash_v4_final_premium.png', 'wb') as f:
+        f.write(make_png_high_quality(1024, 1024, draw_premium_cup_v4, args.adaptive, args.max_samples))
+    print("Created splash_v4_final_premium.png")
@@ -1,26 +1,7 @@
-import zlib
-import struct
 import math
+import os
 
-def make_png(width, height, draw_func, is_rgba=False):
-    png = b'\x89PNG\r\n\x1a\n'
-    color_type = 6 if is_rgba else 2
-    ihdr_content = struct.pack('!IIBBBBB', width, height, 8, color_type, 0, 0, 0)
-    ihdr = b'IHDR' + ihdr_content
-    png += struct.pack('!I', len(ihdr_content)) + ihdr + struct.pack('!I', zlib.crc32(ihdr) & 0xFFFFFFFF)
-
-    raw_data = b''
-    for y in range(height):
-        raw_data += b'\x00'
-        for x in range(width):
-            raw_data += bytes(draw_func(x, y, width, height))
-    
-    compressor = zlib.compressobj()
-    idat_data = compressor.compress(raw_data) + compressor.flush()
-    idat = b'IDAT' + idat_data
-    png += struct.pack('!I', len(idat_data)) + idat + struct.pack('!I', zlib.crc32(idat) & 0xFFFFFFFF)
-    png += struct.pack('!I', 0) + b'IEND' + struct.pack('!I', zlib.crc32(b'IEND') & 0xFFFFFFFF)
-    return png
+from png_encoder import make_png
 
 # V15: Bean + Pen Nib (Coffee + Logging)
 def draw_v15(x, y, w, h):
@@ -75,8 +56,12 @@ def draw_v17(x, y, w, h):
         if not (270 < x < 754 and 270 < y < 754): return fg
     return bg
 
-for i, func in enumerate([draw_v15, draw_v16, draw_v17], 15):
-    filename = f'/Users/jw/.gemini/antigravity/brain/c836824c-eb45-4c64-9de3-8eaf3e492b38/app_icon_v{i}.png'
-    with open(filename, 'wb') as f:
-        f.write(make_png(1024, 1024, func))
-    print(f"Created {filename}")
+if __name__ == '__main__':
+    # Candidates for comparison only; they are not bundled assets
+    # (contact_sheet.py previews them side by side without full renders)
+    os.makedirs('build/identity_icons', exist_ok=True)
+    for i, func in enumerate([draw_v15, draw_v16, draw_v17], 15):
+        filename = f'build/identity_icons/app_icon_v{i}.png'
+        with open(filename, 'wb') as f:
+            f.write(make_png(1024, 1024, func, indexed=True))
+        print(f"Created {filename}")
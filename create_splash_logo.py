@@ -1,26 +1,5 @@
 
-import zlib
-import struct
-import math
-
-def make_png(width, height, draw_func):
-    png = b'\x89PNG\r\n\x1a\n'
-    ihdr_content = struct.pack('!IIBBBBB', width, height, 8, 6, 0, 0, 0)
-    ihdr = b'IHDR' + ihdr_content
-    png += struct.pack('!I', len(ihdr_content)) + ihdr + struct.pack('!I', zlib.crc32(ihdr) & 0xFFFFFFFF)
-
-    raw_data = b''
-    for y in range(height):
-        raw_data += b'\x00'
-        for x in range(width):
-            raw_data += bytes(draw_func(x, y, width, height))
-    
-    compressor = zlib.compressobj()
-    idat_data = compressor.compress(raw_data) + compressor.flush()
-    idat = b'IDAT' + idat_data
-    png += struct.pack('!I', len(idat_data)) + idat + struct.pack('!I', zlib.crc32(idat) & 0xFFFFFFFF)
-    png += struct.pack('!I', 0) + b'IEND' + struct.pack('!I', zlib.crc32(b'IEND') & 0xFFFFFFFF)
-    return png
+from png_encoder import make_png
 
 def draw_cup_pen_splash(x, y, w, h):
     cx, cy = w/2, h/2
@@ -59,6 +38,7 @@ def draw_cup_pen_splash(x, y, w, h):
             
     return trans
 
-with open('/Users/jw/workspace/coffee-note-app/assets/images/splash_logo_new.png', 'wb') as f:
-    f.write(make_png(512, 512, draw_cup_pen_splash))
-print("Created splash_logo_new.png")
+if __name__ == '__main__':
+    with open('assets/images/splash_logo_new.png', 'wb') as f:
+        f.write(make_png(512, 512, draw_cup_pen_splash, is_rgba=True))
+    print("Created splash_logo_new.png")
@@ -1,51 +1,30 @@
 
-import zlib
-import struct
+import argparse
 import math
 
-def make_png_v5_pro(width, height, draw_func):
-    # Pro RGBA with 4x4 supersampling for maximum smoothness
-    ss = 4 
-    
-    png = b'\x89PNG\r\n\x1a\n'
-    ihdr_content = struct.pack('!IIBBBBB', width, height, 8, 6, 0, 0, 0)
-    ihdr = b'IHDR' + ihdr_content
-    png += struct.pack('!I', len(ihdr_content)) + ihdr + struct.pack('!I', zlib.crc32(ihdr) & 0xFFFFFFFF)
+from culling import bounded, scaled_boxes
+from png_encoder import encode_png
+from supersample import SAMPLING, adaptive_rows, uniform_rows
 
-    raw_data = b''
-    for y in range(height):
-        if y % 200 == 0: print(f"Rendering row {y}...")
-        raw_data += b'\x00'
-        for x in range(width):
-            r_sum, g_sum, b_sum, a_sum = 0, 0, 0, 0
-            for sy in range(ss):
-                for sx in range(ss):
-                    px = x + (sx + 0.5) / ss
-                    py = y + (sy + 0.5) / ss
-                    cr, cg, cb, ca = draw_func(px, py, width, height)
-                    r_sum += cr * (ca / 255.0)
-                    g_sum += cg * (ca / 255.0)
-                    b_sum += cb * (ca / 255.0)
-                    a_sum += ca
-            
-            samples = ss * ss
-            avg_a = int(a_sum / samples)
-            if avg_a > 0:
-                # Weighted average to preserve color accuracy on semi-transparent edges
-                avg_r = int(r_sum / (a_sum / 255.0)) if a_sum > 0 else 0
-                avg_g = int(g_sum / (a_sum / 255.0)) if a_sum > 0 else 0
-                avg_b = int(b_sum / (a_sum / 255.0)) if a_sum > 0 else 0
-                raw_data += bytes([avg_r, avg_g, avg_b, avg_a])
-            else:
-                raw_data += bytes([255, 255, 255, 0]) # White transparent
-    
-    compressor = zlib.compressobj(level=9)
-    idat_data = compressor.compress(raw_data) + compressor.flush()
-    idat = b'IDAT' + idat_data
-    png += struct.pack('!I', len(idat_data)) + idat + struct.pack('!I', zlib.crc32(idat) & 0xFFFFFFFF)
-    png += struct.pack('!I', 0) + b'IEND' + struct.pack('!I', zlib.crc32(b'IEND') & 0xFFFFFFFF)
-    return png
+def report_progress(y):
+    if y % 200 == 0: print(f"Rendering row {y}...")
 
+def make_png_v5_pro(width, height, draw_func, adaptive=False, max_samples=16):
+    if adaptive:
+        # Refine only edge pixels, up to max_samples per pixel
+        rows = adaptive_rows(width, height, draw_func, max_samples, offset=0.5, empty=(255, 255, 255, 0))
+    else:
+        rows = uniform_rows(width, height, draw_func, *SAMPLING['v5'], progress=report_progress)
+    return encode_png(width, height, rows, color_type=6, level=9)
+
+def v5_bounds(w, h):
+    # Cup, handle and saucer / steam and nib, in the nx, ny space of
+    # draw_legendary_coffee_v5 with some margin; the steam box holds the
+    # steam and nib at every steam_phase
+    return scaled_boxes([(-0.75, -0.25, 1.05, 0.7), (-0.4, -1.45, 0.4, -0.35)],
+                        w/2, h/2 * 1.08, w * 0.55 / 2, h * 0.55 / 2)
+
+@bounded(v5_bounds, (0, 0, 0, 0))
 def draw_legendary_coffee_v5(x, y, w, h):
     cx, cy = w/2, h/2 * 1.08
     dx, dy = x - cx, y - cy
@@ -82,14 +61,16 @@ def draw_legendary_coffee_v5(x, y, w, h):
         return white
 
     # Steam trail to Pen Nib
+    steam_amp = 0.12
+    steam_phase = 0.0  # animated by steam_animation.py
     steam_y = ny + 0.5
     if -0.9 < steam_y < 0.1:
-        off_x = 0.12 * math.sin(steam_y * 4.5)
+        off_x = steam_amp * math.sin(steam_y * 4.5 + steam_phase)
         if abs(nx - off_x) < 0.04: # Slightly thicker line (0.04)
             return white
             
     # Pen Nib
-    pdx, pdy = nx - 0.12 * math.sin(-0.9 * 4.5), ny + 0.95
+    pdx, pdy = nx - steam_amp * math.sin(-0.9 * 4.5 + steam_phase), ny + 0.95
     if abs(pdx) < 0.22 and -0.15 < pdy < 0.4:
         w_at_y = 0.22 * (1 - (pdy + 0.1) / 0.5)
         if abs(pdx) < w_at_y:
@@ -100,6 +81,12 @@ def draw_legendary_coffee_v5(x, y, w, h):
 
     return trans
 
-with open('/Users/jw/workspace/coffee-note-app/assets/images/splash_v5_pro_transparent.png', 'wb') as f:
-    f.write(make_png_v5_pro(1024, 1024, draw_legendary_coffee_v5))
-print("Created splash_v5_pro_transparent.png")
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--adaptive', action='store_true', help="supersample edge pixels only")
+    parser.add_argument('--max-samples', type=int, default=16)
+    args = parser.parse_args()
+
+    with open('assets/images/splash_v5_pro_transparent.png', 'wb') as f:
+        f.write(make_png_v5_pro(1024, 1024, draw_legendary_coffee_v5, args.adaptive, args.max_samples))
+    print("Created splash_v5_pro_transparent.png")
@@ -0,0 +1,61 @@
+import math
+
+# Spatial culling. A draw function can declare where its shapes are:
+#
+#   @bounded(v5_bounds, (0, 0, 0, 0))
+#   def draw_legendary_coffee_v5(x, y, w, h): ...
+#
+# v5_bounds(w, h) returns boxes (x0, y0, x1, y1) in draw coordinates, and the
+# draw function must return `background` for every point outside all of them.
+# The render loops (png_encoder.render_rows and supersample.uniform_rows /
+# adaptive_rows) then fill pixels outside the boxes with the background
+# instead of sampling them. Boxes must be conservative; as long as they are,
+# the output does not change.
+
+def bounded(boxes, background):
+    def declare(draw_func):
+        draw_func.bounds = boxes
+        draw_func.background = background
+        return draw_func
+    return declare
+
+def pixel_boxes(draw_func, width, height):
+    # Declared boxes as pixel index ranges (x_start, y_start, x_stop, y_stop).
+    # Every sample of pixel x lies in [x, x + 1); one pixel of padding on each
+    # side keeps float rounding at the box edges on the safe side.
+    boxes = []
+    for x0, y0, x1, y1 in draw_func.bounds(width, height):
+        boxes.append((max(0, math.floor(x0) - 1), max(0, math.floor(y0) - 1),
+                      min(width, math.ceil(x1) + 1), min(height, math.ceil(y1) + 1)))
+    return boxes
+
+def row_spans(draw_func, width, height):
+    # -> function y -> sorted, merged (x_start, x_stop) ranges that have to be
+    # drawn; the whole row when draw_func declares no bounds
+    if getattr(draw_func, 'bounds', None) is None:
+        full = [(0, width)]
+        return lambda y: full
+    boxes = pixel_boxes(draw_func, width, height)
+
+    def spans(y):
+        return merge_spans((x0, x1) for x0, y0, x1, y1 in boxes if y0 <= y < y1 and x0 < x1)
+    return spans
+
+def merge_spans(ranges):
+    # (x_start, x_stop) ranges -> sorted, merged ranges
+    merged = []
+    for x0, x1 in sorted(ranges):
+        if merged and x0 <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], x1))
+        else:
+            merged.append((x0, x1))
+    return merged
+
+def background(draw_func):
+    # The declared background, or None when draw_func declares no bounds
+    return getattr(draw_func, 'background', None) if getattr(draw_func, 'bounds', None) else None
+
+def scaled_boxes(boxes, cx, cy, unit_x, unit_y):
+    # Boxes given in a design's normalized space (nx = (x - cx) / unit_x, ...)
+    # -> draw coordinates
+    return [(cx + x0 * unit_x, cy + y0 * unit_y, cx + x1 * unit_x, cy + y1 * unit_y) for x0, y0, x1, y1 in boxes]
@@ -0,0 +1,211 @@
+import argparse
+import hashlib
+import os
+import shutil
+import sys
+import time
+import zlib
+from itertools import islice
+
+import numpy as np
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from png_encoder import PNG_SIGNATURE, png_files, write_png
+from png_reader import READ_SIZE, PngHeader, PngStream, pixel_color_type, pixel_rows, read_chunks
+
+# Pixel-level regression check of PNG assets against golden copies. Byte
+# comparison breaks as soon as compression settings change; this decodes
+# both files, compares blocks of rows with NumPy and keeps only running
+# totals. Files are decoded by Pillow when it is installed (its C unfilter is
+# what keeps Average/Paeth-filtered images fast); without it they are
+# streamed row by row through png_reader.PngStream, so memory stays at one
+# block per file but Average/Paeth rows are unfiltered in Python.
+#
+#   python golden_check.py --snapshot         # before changing a draw function / the encoder
+#   python golden_check.py --heatmap build/golden_diff
+#
+# Images whose header, palette and decompressed (still filtered) data are
+# identical are equal without decoding; only the others are unfiltered and
+# compared pixel by pixel, as RGBA (RGB and palette images get alpha 255).
+# The color of pixels that are fully transparent in both does not count.
+
+GOLDEN_DIR = 'build/golden'
+BLOCK_ROWS = 64
+
+class ImageDiff:
+    def __init__(self, width, height):
+        self.width, self.height = width, height
+        self.max_error = 0
+        self.error_sum = 0
+        self.differing = 0
+        self.left = self.top = self.right = self.bottom = None
+
+    def add(self, y, errors):
+        # errors: (rows, width, 4) absolute channel differences starting at row y
+        self.max_error = max(self.max_error, int(errors.max(initial=0)))
+        self.error_sum += int(errors.sum(dtype=np.int64))
+        changed = errors.any(axis=-1)
+        count = int(changed.sum())
+        if not count:
+            return
+        self.differing += count
+        rows = np.flatnonzero(changed.any(axis=1))
+        cols = np.flatnonzero(changed.any(axis=0))
+        self.top = y + int(rows[0]) if self.top is None else self.top
+        self.bottom = y + int(rows[-1])
+        self.left = int(cols[0]) if self.left is None else min(self.left, int(cols[0]))
+        self.right = int(cols[-1]) if self.right is None else max(self.right, int(cols[-1]))
+
+    @property
+    def mean_error(self):
+        return self.error_sum / (self.width * self.height * 4)
+
+    @property
+    def bbox(self):
+        return None if self.top is None else (self.left, self.top, self.right, self.bottom)
+
+def image_digest(path):
+    # -> (PngHeader, digest of everything that determines the pixels)
+    digest = hashlib.sha256()
+    header = None
+    decompressor = zlib.decompressobj()
+    with open(path, 'rb') as f:
+        if f.read(8) != PNG_SIGNATURE:
+            raise ValueError("not a PNG file")
+        for chunk_type, data in read_chunks(f, verify_crc=False):
+            if chunk_type == b'IHDR':
+                header = PngHeader(data)
+            if chunk_type in (b'IHDR', b'PLTE', b'tRNS'):
+                digest.update(chunk_type + data)
+            elif chunk_type == b'IDAT':
+                while data:
+                    digest.update(decompressor.decompress(data, READ_SIZE))
+                    data = decompressor.unconsumed_tail
+    digest.update(decompressor.flush())
+    if header is None:
+        raise ValueError("missing IHDR")
+    return header, digest.digest()
+
+def rgba_blocks(path):
+    # -> generator of (rows, width, 4) uint8 blocks
+    if Image is not None:
+        with Image.open(path) as image:
+            pixels = np.asarray(image.convert('RGBA'))
+        return (pixels[y:y + BLOCK_ROWS] for y in range(0, len(pixels), BLOCK_ROWS))
+    stream = PngStream(path)
+    rows = pixel_rows(stream)
+
+    def blocks():
+        while True:
+            block = list(islice(rows, BLOCK_ROWS))
+            if not block:
+                return
+            pixels = np.frombuffer(b''.join(block), dtype=np.uint8)
+            if pixel_color_type(stream) == 2:
+                pixels = pixels.reshape(len(block), -1, 3)
+                pixels = np.concatenate([pixels, np.full(pixels.shape[:2] + (1,), 255, np.uint8)], axis=-1)
+            yield pixels.reshape(len(block), -1, 4)
+    return blocks()
+
+def heatmap_rows(golden, errors):
+    # Differences in red over the dimmed golden image
+    gray = (golden[..., :3].mean(axis=-1) * golden[..., 3] / 255 / 4).astype(np.uint8)
+    out = np.repeat(gray[..., np.newaxis], 3, axis=-1)
+    error = errors.max(axis=-1)
+    changed = error > 0
+    out[changed] = 0
+    out[changed, 0] = 64 + (error[changed].astype(np.int64) * 191 // 255)
+    return out
+
+def compare_png(golden_path, path, heatmap_path=None):
+    # -> ImageDiff; raises ValueError when the images cannot be compared
+    header, digest = image_digest(path)
+    golden_header, golden_digest = image_digest(golden_path)
+    if golden_digest == digest:
+        return ImageDiff(header.width, header.height)
+    if (golden_header.width, golden_header.height) != (header.width, header.height):
+        raise ValueError(f"size changed from {golden_header.width}x{golden_header.height} "
+                         f"to {header.width}x{header.height}")
+    diff = ImageDiff(header.width, header.height)
+    heatmap = []
+    y = 0
+    for expected, actual in zip(rgba_blocks(golden_path), rgba_blocks(path)):
+        expected = expected.astype(np.int16)
+        actual = actual.astype(np.int16)
+        errors = np.abs(expected - actual).astype(np.uint8)
+        errors[(expected[..., 3] == 0) & (actual[..., 3] == 0)] = 0
+        diff.add(y, errors)
+        if heatmap_path:
+            heatmap.extend(heatmap_rows(expected, errors))
+        y += len(errors)
+    if heatmap_path and diff.differing:
+        write_png(heatmap_path, diff.width, diff.height, (row.tobytes() for row in heatmap), 2, 6)
+    return diff
+
+def is_png(path):
+    with open(path, 'rb') as f:
+        return f.read(8) == PNG_SIGNATURE
+
+def snapshot(paths, golden_dir):
+    os.makedirs(golden_dir, exist_ok=True)
+    count = 0
+    for path in png_files(paths):
+        if is_png(path):
+            shutil.copy2(path, os.path.join(golden_dir, os.path.basename(path)))
+            count += 1
+    print(f"Saved {count} golden images to {golden_dir}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare PNG assets pixel by pixel against golden copies")
+    parser.add_argument('paths', nargs='*', default=['assets/images'], help="PNG files or directories")
+    parser.add_argument('--golden', default=GOLDEN_DIR, help="directory with the golden copies (same file names)")
+    parser.add_argument('--snapshot', action='store_true', help="copy the current PNGs to the golden directory")
+    parser.add_argument('--tolerance', type=int, default=0, help="largest channel error that still passes")
+    parser.add_argument('--heatmap', metavar='DIR', help="write a diff heatmap PNG for every changed image")
+    args = parser.parse_args()
+
+    if args.snapshot:
+        snapshot(args.paths, args.golden)
+        return
+    if args.heatmap:
+        os.makedirs(args.heatmap, exist_ok=True)
+
+    start = time.perf_counter()
+    failures = checked = 0
+    for path in png_files(args.paths):
+        name = os.path.basename(path)
+        golden_path = os.path.join(args.golden, name)
+        if not is_png(path):
+            print(f"{name}: skipped, not a PNG file")
+            continue
+        checked += 1
+        if not os.path.exists(golden_path):
+            print(f"{name}: no golden copy")
+            failures += 1
+            continue
+        heatmap_path = os.path.join(args.heatmap, name) if args.heatmap else None
+        try:
+            diff = compare_png(golden_path, path, heatmap_path)
+        except (ValueError, OSError) as e:
+            print(f"{name}: {e}")
+            failures += 1
+            continue
+        if not diff.differing:
+            print(f"{name}: OK")
+            continue
+        left, top, right, bottom = diff.bbox
+        status = "CHANGED" if diff.max_error > args.tolerance else "within tolerance"
+        print(f"{name}: {status}, {diff.differing:,} pixels differ ({diff.differing / (diff.width * diff.height):.2%}), "
+              f"max error {diff.max_error}, mean error {diff.mean_error:.4f}, "
+              f"bbox ({left}, {top})-({right}, {bottom})" + (f" -> {heatmap_path}" if heatmap_path else ""))
+        failures += diff.max_error > args.tolerance
+    print(f"Checked {checked} images in {time.perf_counter() - start:.2f}s, {failures} failed")
+    if failures:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
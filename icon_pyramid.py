@@ -0,0 +1,188 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pool
+
+from build_assets import ROOT, load_manifest
+from parallel_render import load_draw, render_raw
+from png_encoder import CHANNELS, FILTER_MODES, encode_png
+from supersample import adaptive_rows, uniform_rows
+
+# Launcher-icon pyramid: every Android density and iOS icon size from the
+# same draw_* functions as the 1024px masters in asset_manifest.json.
+#
+#   direct  each size is rendered from the draw function itself, with ss x ss
+#           samples per output pixel (sharp small sizes, no resampling blur);
+#           one process per size
+#   box     the master is rendered once and area-averaged down to every size
+#           (alpha premultiplied), needs numpy
+#
+# Draw functions take coordinates in their 1024px design space; pixel x of a
+# size-N icon covers design coordinates [x*k - 0.5, (x+1)*k - 0.5], k = 1024/N,
+# so the full-size icon is the same as the master.
+
+ANDROID_RES = 'android/app/src/main/res'
+IOS_ICONSET = 'ios/Runner/Assets.xcassets/AppIcon.appiconset'
+DENSITIES = {'mdpi': 1, 'hdpi': 1.5, 'xhdpi': 2, 'xxhdpi': 3, 'xxxhdpi': 4}
+LAUNCHER_DP = 48
+FOREGROUND_DP = 108  # adaptive icon layer
+
+# Icon sources, as configured for flutter_launcher_icons in pubspec.yaml. The
+# icons are rendered from these entries' draw functions in the manifest, which
+# is not the artwork checked in under those paths: app_icon.png and
+# app_icon_foreground.png are a different (JPEG) design that the manifest
+# protects ("protect": true). Writing the pyramid into the repo root therefore
+# changes the icon on every platform, so main() wants --force for that.
+SOURCES = {
+    'launcher': 'assets/images/app_icon.png',
+    'foreground': 'assets/images/app_icon_foreground.png',
+}
+
+def icon_targets():
+    # (source, path relative to the repo root, size in pixels)
+    targets = []
+    for density, scale in DENSITIES.items():
+        targets.append(('launcher', f"{ANDROID_RES}/mipmap-{density}/ic_launcher.png", round(LAUNCHER_DP * scale)))
+        targets.append(('foreground', f"{ANDROID_RES}/drawable-{density}/ic_launcher_foreground.png",
+                        round(FOREGROUND_DP * scale)))
+    with open(os.path.join(ROOT, IOS_ICONSET, 'Contents.json')) as f:
+        images = json.load(f)['images']
+    seen = set()
+    for image in images:
+        name = image.get('filename')
+        if not name or name in seen:
+            continue
+        seen.add(name)
+        points = float(image['size'].split('x')[0])
+        targets.append(('launcher', f"{IOS_ICONSET}/{name}", round(points * int(image['scale'].rstrip('x')))))
+    return targets
+
+class ScaledDraw:
+    # Calls a design-space draw function from the pixel grid of a smaller icon;
+    # RGB colors get an opaque alpha so the RGBA supersampling code applies
+    def __init__(self, draw_func, design, size, rgb):
+        self.draw_func, self.design, self.rgb = draw_func, design, rgb
+        self.scale = design / size
+
+    def __call__(self, x, y, width, height):
+        color = self.draw_func(x * self.scale - 0.5, y * self.scale - 0.5, self.design, self.design)
+        return color + (255,) if self.rgb else color
+
+def drop_alpha(rows):
+    # RGBA rows -> RGB, removing the alpha byte that ScaledDraw added
+    for row in rows:
+        rgb = bytearray(row)
+        del rgb[3::4]
+        yield rgb
+
+def render_direct(job):
+    draw_func, design, color_type, size, ss, adaptive, level, filter_mode = job
+    rgb = color_type == 2
+    if size >= design:
+        ss = 1
+    draw = ScaledDraw(draw_func, design, size, rgb)
+    if adaptive:
+        rows = adaptive_rows(size, size, draw, ss * ss, 0.5, (0, 0, 0, 0))
+    else:
+        rows = uniform_rows(size, size, draw, ss, 0.5, (0, 0, 0, 0))
+    if rgb:
+        rows = drop_alpha(rows)
+    return encode_png(size, size, rows, color_type, level, filter_mode)
+
+def box_weights(size, design):
+    # weights[i, j]: share of design pixel j inside output pixel i (rows sum to 1)
+    import numpy as np
+    step = design / size
+    edges = np.arange(size + 1) * step
+    cells = np.arange(design)
+    lo = np.maximum(edges[:-1, None], cells[None, :])
+    hi = np.minimum(edges[1:, None], cells[None, :] + 1)
+    return np.clip(hi - lo, 0, None) / step
+
+def box_downsample(master, size):
+    import numpy as np
+    design = master.shape[0]
+    weights = box_weights(size, design)
+    pixels = master.astype(np.float64)
+    if pixels.shape[2] == 4:
+        # Premultiply so transparent pixels do not bleed their color into edges
+        pixels[..., :3] *= pixels[..., 3:] / 255.0
+    # Rows then columns, as two matrix products
+    out = np.tensordot(weights, pixels, axes=(1, 0))
+    out = np.tensordot(weights, out, axes=(1, 1)).transpose(1, 0, 2)
+    if out.shape[2] == 4:
+        alpha = out[..., 3:]
+        out[..., :3] = np.where(alpha > 0, out[..., :3] * 255.0 / np.where(alpha > 0, alpha, 1), 0)
+    return np.clip(np.rint(out), 0, 255).astype(np.uint8)
+
+def render_master(entry, workers):
+    import numpy as np
+    size = entry['size']
+    raw = render_raw(size, size, load_draw(entry['draw']), entry['color_type'], entry.get('sampling'),
+                     entry.get('adaptive', False), workers=workers)
+    channels = 4 if entry.get('sampling') else CHANNELS[entry['color_type']]
+    return np.frombuffer(raw, dtype=np.uint8).reshape(size, size, channels)
+
+def write_icon(path, png):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(png)
+
+def build_pyramid(out_root, mode='direct', ss=4, adaptive=False, workers=None, level=9, filter_mode='adaptive'):
+    entries = {entry['output']: entry for entry in load_manifest()}
+    sources = {key: entries[output] for key, output in SOURCES.items()}
+    targets = icon_targets()
+
+    if mode == 'direct':
+        jobs = [(load_draw(sources[key]['draw']), sources[key]['size'], sources[key]['color_type'],
+                 size, ss, adaptive, level, filter_mode) for key, _, size in targets]
+        # Largest sizes first so they do not end up alone at the tail of the pool
+        order = sorted(range(len(jobs)), key=lambda i: -targets[i][2])
+        with Pool(workers or os.cpu_count()) as pool:
+            for i, png in zip(order, pool.imap(render_direct, [jobs[i] for i in order])):
+                write_icon(os.path.join(out_root, targets[i][1]), png)
+        return targets
+
+    masters = {key: render_master(entry, workers) for key, entry in sources.items()}
+
+    def resample(target):
+        key, path, size = target
+        icon = box_downsample(masters[key], size)
+        color_type = 6 if icon.shape[2] == 4 else 2
+        rows = [row.tobytes() for row in icon.reshape(size, -1)]
+        write_icon(os.path.join(out_root, path), encode_png(size, size, rows, color_type, level, filter_mode))
+
+    # numpy and zlib release the GIL, so threads resample and encode in parallel
+    with ThreadPoolExecutor(workers or os.cpu_count()) as executor:
+        list(executor.map(resample, targets))
+    return targets
+
+def main():
+    parser = argparse.ArgumentParser(description="Render every Android/iOS launcher icon size from the draw functions")
+    parser.add_argument('--mode', choices=('direct', 'box'), default='direct',
+                        help="render each size directly, or box-filter one master render")
+    parser.add_argument('--out-root', default=os.path.join(ROOT, 'build', 'launcher_icons'),
+                        help="icons are written under this directory with their platform paths "
+                             "(the repo root replaces the platform icon sets and needs --force)")
+    parser.add_argument('--force', action='store_true',
+                        help="allow --out-root to be the repo root, whose icons come from other artwork")
+    parser.add_argument('--ss', type=int, default=4, help="samples per axis per pixel in direct mode")
+    parser.add_argument('--adaptive', action='store_true', help="direct mode: supersample edge pixels only")
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--level', type=int, default=9, help="zlib level")
+    parser.add_argument('--filter', dest='filter_mode', choices=FILTER_MODES, default='adaptive')
+    args = parser.parse_args()
+    if os.path.realpath(args.out_root) == os.path.realpath(ROOT) and not args.force:
+        parser.error("--out-root is the repo root: the platform icons would be replaced by renders of the "
+                     f"manifest draw functions for {', '.join(SOURCES.values())}, which differ from the "
+                     "checked-in artwork; pass --force to do it anyway")
+
+    start = time.perf_counter()
+    targets = build_pyramid(args.out_root, args.mode, args.ss, args.adaptive, args.workers, args.level,
+                            args.filter_mode)
+    print(f"Wrote {len(targets)} icons ({args.mode}) under {args.out_root} in {time.perf_counter() - start:.2f}s")
+
+if __name__ == '__main__':
+    main()
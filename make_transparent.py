@@ -1,30 +1,63 @@
 
-import zlib
-import struct
-from PIL import Image
+import argparse
+import os
 
-def make_transparent(input_path, output_path):
+from PIL import Image, ImageChops
+
+# The background is #5D4037 (93, 64, 55), but let's be flexible and make
+# anything "dark brown-ish" transparent while keeping the "white-ish" line art.
+# Keying works on whole bands (point tables + channel ops), so memory stays at
+# a handful of single-channel buffers instead of a million-tuple list.
+
+def brightness_key(img):
+    # Darkest of R, G, B per pixel: a pixel is "white-ish" only if all three are bright
+    r, g, b, _ = img.split()
+    return ImageChops.darker(ImageChops.darker(r, g), b)
+
+def hard_table(threshold):
+    # Same cutoff as the old per-pixel loop: keep when every channel > threshold
+    return [255 if v > threshold else 0 for v in range(256)]
+
+def soft_table(low, high):
+    # Linear alpha ramp from `low` (fully transparent) to `high` (fully kept)
+    return [0 if v <= low else 255 if v >= high else round(255 * (v - low) / (high - low)) for v in range(256)]
+
+def make_transparent(input_path, output_path, threshold=200, soft=None):
     img = Image.open(input_path).convert("RGBA")
-    datas = img.getdata()
-
-    new_data = []
-    # The target color is #5D4037 (93, 64, 55)
-    # But let's be flexible and make anything "dark brown-ish" transparent
-    # while keeping "white-ish" parts.
-    for item in datas:
-        # If it's bright (white line art), keep it
-        if item[0] > 200 and item[1] > 200 and item[2] > 200:
-            new_data.append(item)
-        else:
-            # Make the brown background fully transparent
-            new_data.append((0, 0, 0, 0))
-
-    img.putdata(new_data)
+    table = soft_table(*soft) if soft else hard_table(threshold)
+    keep = brightness_key(img).point(table)
+
+    if soft:
+        # Scale the existing alpha by the ramp; fully keyed pixels become (0, 0, 0, 0)
+        alpha = ImageChops.multiply(img.getchannel('A'), keep)
+        img.putalpha(alpha)
+        keep = alpha.point(lambda v: 255 if v else 0)
+    img = Image.composite(img, Image.new("RGBA", img.size, (0, 0, 0, 0)), keep)
+
     img.save(output_path, "PNG")
     print(f"Transparency applied: {output_path}")
 
-try:
-    make_transparent('/Users/jw/workspace/coffee-note-app/assets/images/splash_v3_premium.png', 
-                     '/Users/jw/workspace/coffee-note-app/assets/images/splash_v4_transparent.png')
-except Exception as e:
-    print(f"Error: {e}")
+def output_path_for(input_path, out_dir, suffix):
+    base, ext = os.path.splitext(os.path.basename(input_path))
+    return os.path.join(out_dir or os.path.dirname(input_path), f"{base}{suffix}{ext or '.png'}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Key the dark background of splash renders to transparency")
+    parser.add_argument('inputs', nargs='*', help="input images (default: the v3 splash)")
+    parser.add_argument('--out-dir', help="write outputs here (default: next to each input)")
+    parser.add_argument('--suffix', default='_transparent', help="appended to each output file name")
+    parser.add_argument('--threshold', type=int, default=200, help="hard cutoff per channel")
+    parser.add_argument('--soft', nargs=2, type=int, metavar=('LOW', 'HIGH'),
+                        help="anti-aliased alpha ramp between these brightness levels")
+    args = parser.parse_args()
+
+    if args.inputs:
+        jobs = [(path, output_path_for(path, args.out_dir, args.suffix)) for path in args.inputs]
+    else:
+        jobs = [('assets/images/splash_v3_premium.png', 'assets/images/splash_v4_transparent.png')]
+
+    for input_path, output_path in jobs:
+        try:
+            make_transparent(input_path, output_path, args.threshold, args.soft)
+        except Exception as e:
+            print(f"Error: {input_path}: {e}")
@@ -0,0 +1,143 @@
+import argparse
+import io
+import multiprocessing
+import os
+import time
+
+from PIL import Image
+
+from asset_usage import bundle_entries, bundled_files, collect_references
+from build_assets import ROOT
+from golden_check import is_png
+from png_encoder import encode_indexed, encode_smallest, png_files
+from png_reader import PngStream, pixel_color_type, pixel_rows
+
+# Post-generation optimization of the bundled PNGs. Every file is re-encoded
+# from its pixels only (ancillary chunks are dropped) as the smallest of:
+# every filter mode x zlib strategy (png_encoder.encode_smallest) and a
+# palette PNG when the image has at most 256 colors. Images that lib/ loads at
+# runtime (see asset_usage.py) also get a lossless WebP candidate; the
+# launcher-icon and splash sources stay PNG because their build tools read
+# PNG. Every candidate is decoded again and checked against the source
+# pixels as RGBA; a file whose candidate does not match, or that uses an
+# RGB/gray tRNS color key, is reported and left as it is. Each candidate's
+# decode time (Pillow, best of --decode-runs) is reported next to its size.
+#
+#   python optimize_assets.py                 # report only
+#   python optimize_assets.py --write         # replace PNGs that got smaller
+#   python optimize_assets.py --webp-out build/webp
+
+def decode_seconds(data, runs):
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        Image.open(io.BytesIO(data)).load()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def pixels_of(data):
+    # Compared as RGBA, so a candidate that loses transparency does not pass
+    return Image.open(io.BytesIO(data)).convert('RGBA').tobytes()
+
+def smallest_png(width, height, rows, color_type):
+    png, filter_mode, strategy = encode_smallest(width, height, rows, color_type)
+    settings = f"{filter_mode}/{strategy}"
+    for filter_mode in ('none', 'adaptive'):
+        indexed = encode_indexed(width, height, rows, color_type, 9, filter_mode)
+        if len(indexed) < len(png):
+            png, settings = indexed, f"{filter_mode}/palette"
+    return png, settings
+
+def lossless_webp(width, height, rows, color_type):
+    mode = 'RGBA' if color_type == 6 else 'RGB'
+    image = Image.frombytes(mode, (width, height), b''.join(bytes(row) for row in rows))
+    out = io.BytesIO()
+    image.save(out, 'WEBP', lossless=True, quality=100, method=6, exact=True)
+    return out.getvalue()
+
+def optimize(job):
+    # -> report dict for one file
+    path, webp, decode_runs = job
+    with open(path, 'rb') as f:
+        original = f.read()
+    stream = PngStream(path)
+    try:
+        rows = list(pixel_rows(stream))
+    except ValueError as e:
+        return {'path': path, 'error': str(e)}
+    if stream.trns is not None and stream.header.color_type != 3:
+        # pixel_rows ignores a color key, so re-encoding would drop it
+        return {'path': path, 'error': "has a tRNS color key, which re-encoding would lose"}
+    width, height, color_type = stream.header.width, stream.header.height, pixel_color_type(stream)
+    source = pixels_of(original)
+    formats = {'original': (original, '')}
+    formats['png'] = smallest_png(width, height, rows, color_type)
+    if webp:
+        formats['webp'] = (lossless_webp(width, height, rows, color_type), 'lossless')
+    report = {'path': path, 'formats': {}}
+    for name, (data, settings) in formats.items():
+        if name != 'original' and pixels_of(data) != source:
+            # Keep the original file; report instead of aborting the batch
+            return {'path': path, 'error': f"{name} output is not lossless"}
+        report['formats'][name] = {
+            'bytes': len(data),
+            'decode_ms': decode_seconds(data, decode_runs) * 1000,
+            'settings': settings,
+            'data': data,
+        }
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompress bundled PNGs and try lossless WebP, with decode times")
+    parser.add_argument('paths', nargs='*', default=[os.path.join(ROOT, 'assets', 'images')])
+    parser.add_argument('--write', action='store_true', help="replace PNGs whose re-encoding is smaller")
+    parser.add_argument('--webp-out', metavar='DIR', help="write the WebP candidates to this directory")
+    parser.add_argument('--webp-all', action='store_true',
+                        help="try WebP for every image, not only the ones lib/ loads at runtime")
+    parser.add_argument('--decode-runs', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    references, _ = collect_references(bundled_files(bundle_entries()))
+    runtime = {os.path.join(ROOT, asset) for asset, refs in references.items() if any(k == 'runtime' for k, _ in refs)}
+    jobs = []
+    for path in png_files(args.paths):
+        if not is_png(path):
+            print(f"{os.path.basename(path):<36} skipped: not a PNG file")
+            continue
+        jobs.append((path, args.webp_all or os.path.abspath(path) in runtime, args.decode_runs))
+
+    totals = dict.fromkeys(('original', 'best'), 0)
+    with multiprocessing.Pool(args.workers) as pool:
+        for report in pool.imap(optimize, jobs):
+            path = report['path']
+            name = os.path.basename(path)
+            if 'error' in report:
+                print(f"{name:<36} skipped: {report['error']}")
+                continue
+            formats = report['formats']
+            print(name)
+            for fmt, info in formats.items():
+                print(f"  {fmt:<9} {info['bytes']:>9,} B  decode {info['decode_ms']:>7.2f} ms  {info['settings']}")
+            original = formats['original']['bytes']
+            png = formats['png']
+            totals['original'] += original
+            totals['best'] += min(original, png['bytes'], formats.get('webp', png)['bytes'])
+            if args.write and png['bytes'] < original:
+                with open(path, 'wb') as f:
+                    f.write(png['data'])
+                print(f"  wrote {path}")
+            if args.webp_out and 'webp' in formats:
+                os.makedirs(args.webp_out, exist_ok=True)
+                webp_path = os.path.join(args.webp_out, os.path.splitext(name)[0] + '.webp')
+                with open(webp_path, 'wb') as f:
+                    f.write(formats['webp']['data'])
+                print(f"  wrote {webp_path}")
+    if totals['original']:
+        saved = totals['original'] - totals['best']
+        print(f"total {totals['original']:,} -> {totals['best']:,} bytes, saved {saved:,} "
+              f"({saved / totals['original']:.1%})")
+
+if __name__ == '__main__':
+    main()
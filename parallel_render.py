@@ -0,0 +1,179 @@
+import argparse
+import importlib
+import os
+import resource
+import time
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool
+
+from png_encoder import (CHANNELS, FILTER_MODES, IDAT_CHUNK_SIZE, STRATEGIES, encode_png, filtered_scanlines,
+                         render_rows, write_scanlines)
+from supersample import SAMPLING, adaptive_rows, uniform_rows
+
+# Row-band renderer: the canvas is split into horizontal bands, each band is
+# rendered in a worker process, and the bands are filtered and fed to one
+# compressor in image order (Up/Average/Paeth need the row above, which may
+# belong to another band). Pool.imap keeps the order, so the PNG is
+# byte-identical to the serial render for any worker count.
+
+def load_draw(spec):
+    # 'create_v5_splash:draw_legendary_coffee_v5' -> function
+    module, name = spec.split(':')
+    return getattr(importlib.import_module(module), name)
+
+def render_band(job):
+    draw_func, width, height, color_type, sampling, adaptive, max_samples, y_start, y_stop = job
+    if sampling is None:
+        rows = render_rows(width, height, draw_func, CHANNELS[color_type], y_start, y_stop)
+    elif adaptive:
+        ss, offset, empty = SAMPLING[sampling]
+        rows = adaptive_rows(width, height, draw_func, max_samples or ss * ss, offset, empty,
+                             y_start=y_start, y_stop=y_stop)
+    else:
+        ss, offset, empty = SAMPLING[sampling]
+        rows = uniform_rows(width, height, draw_func, ss, offset, empty, y_start=y_start, y_stop=y_stop)
+    # Copy each row: the row generators reuse one buffer
+    return b''.join(bytes(row) for row in rows)
+
+def band_jobs(width, height, draw_func, color_type, sampling, adaptive, max_samples, band_height):
+    return [
+        (draw_func, width, height, color_type, sampling, adaptive, max_samples, y, min(y + band_height, height))
+        for y in range(0, height, band_height)
+    ]
+
+def band_rows(bands, stride):
+    for band in bands:
+        for i in range(0, len(band), stride):
+            yield band[i:i + stride]
+
+def render_parallel(width, height, draw_func, color_type=6, sampling=None, adaptive=False, max_samples=None,
+                    workers=None, band_height=None, level=-1, filter_mode='none', strategy='default', indexed=False):
+    # Supersampled output is always RGBA
+    if sampling is not None:
+        color_type = 6
+    workers = workers or os.cpu_count() or 1
+    # Several bands per worker so the busy centre rows are spread out
+    band_height = band_height or max(1, -(-height // (workers * 4)))
+    jobs = band_jobs(width, height, draw_func, color_type, sampling, adaptive, max_samples, band_height)
+    stride = width * CHANNELS[color_type]
+    if workers == 1:
+        rows = band_rows(map(render_band, jobs), stride)
+        return encode_png(width, height, rows, color_type, level, filter_mode, strategy, indexed)
+    with Pool(workers) as pool:
+        rows = band_rows(pool.imap(render_band, jobs), stride)
+        return encode_png(width, height, rows, color_type, level, filter_mode, strategy, indexed)
+
+def render_raw(width, height, draw_func, color_type=6, sampling=None, adaptive=False, max_samples=None,
+               workers=None, band_height=None):
+    # Same bands as render_parallel, returned as unfiltered raw rows joined together
+    if sampling is not None:
+        color_type = 6
+    workers = workers or os.cpu_count() or 1
+    band_height = band_height or max(1, -(-height // (workers * 4)))
+    jobs = band_jobs(width, height, draw_func, color_type, sampling, adaptive, max_samples, band_height)
+    if workers == 1:
+        return b''.join(map(render_band, jobs))
+    with Pool(workers) as pool:
+        return b''.join(pool.imap(render_band, jobs))
+
+# Rows per band when streaming to a file: small, so the bands in flight stay
+# a few rows each whatever the canvas size
+STREAM_BAND_HEIGHT = 16
+
+def ordered_bands(pool, jobs, window):
+    # Like pool.imap(render_band, jobs), but with at most `window` bands
+    # submitted and not yet consumed, so finished bands cannot pile up
+    jobs = iter(jobs)
+    pending = deque(pool.apply_async(render_band, (job,)) for job in islice(jobs, window))
+    while pending:
+        band = pending.popleft().get()
+        job = next(jobs, None)
+        if job is not None:
+            pending.append(pool.apply_async(render_band, (job,)))
+        yield band
+
+def render_to_file(path, width, height, draw_func, color_type=6, sampling=None, adaptive=False, max_samples=None,
+                   workers=None, band_height=STREAM_BAND_HEIGHT, level=-1, filter_mode='none', strategy='default',
+                   chunk_size=IDAT_CHUNK_SIZE):
+    # Streaming render: bands are filtered and compressed as they arrive and
+    # written out in fixed-size IDAT chunks. Memory holds at most 2 bands per
+    # worker plus one IDAT chunk, so it does not grow with the canvas.
+    if sampling is not None:
+        color_type = 6
+    workers = workers or os.cpu_count() or 1
+    jobs = band_jobs(width, height, draw_func, color_type, sampling, adaptive, max_samples, band_height)
+    stride = width * CHANNELS[color_type]
+    with open(path, 'wb') as f:
+        if workers == 1:
+            rows = band_rows(map(render_band, jobs), stride)
+            scanlines = filtered_scanlines(rows, height, CHANNELS[color_type], filter_mode)
+            return write_scanlines(f, width, height, scanlines, color_type, level, strategy, chunk_size)
+        with Pool(workers) as pool:
+            rows = band_rows(ordered_bands(pool, jobs, workers * 2), stride)
+            scanlines = filtered_scanlines(rows, height, CHANNELS[color_type], filter_mode)
+            return write_scanlines(f, width, height, scanlines, color_type, level, strategy, chunk_size)
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a draw_* function in parallel row bands")
+    parser.add_argument('draw', help="module:function, e.g. create_v5_splash:draw_legendary_coffee_v5")
+    parser.add_argument('--size', type=int, default=1024)
+    parser.add_argument('--rgb', action='store_true', help="write RGB (color type 2) instead of RGBA")
+    parser.add_argument('--sampling', choices=sorted(SAMPLING), help="supersampling scheme")
+    parser.add_argument('--adaptive', action='store_true')
+    parser.add_argument('--max-samples', type=int)
+    parser.add_argument('--level', type=int, default=-1, help="zlib level")
+    parser.add_argument('--filter', dest='filter_mode', choices=FILTER_MODES, default='none')
+    parser.add_argument('--strategy', choices=sorted(STRATEGIES), default='default')
+    parser.add_argument('--indexed', action='store_true', help="write a palette PNG when it is smaller")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--band-height', type=int)
+    parser.add_argument('--out', help="output PNG path")
+    parser.add_argument('--speedup', action='store_true', help="time 1..--workers processes and print a table")
+    parser.add_argument('--stream', action='store_true',
+                        help="stream bands straight into IDAT chunks of --out (bounded memory, for huge canvases)")
+    args = parser.parse_args()
+
+    draw_func = load_draw(args.draw)
+    options = dict(color_type=2 if args.rgb else 6, sampling=args.sampling, adaptive=args.adaptive,
+                   max_samples=args.max_samples, band_height=args.band_height, level=args.level,
+                   filter_mode=args.filter_mode, strategy=args.strategy, indexed=args.indexed)
+
+    if args.speedup:
+        print(f"{'workers':>7}  {'seconds':>8}  {'speedup':>7}  identical")
+        baseline, baseline_png = None, None
+        for workers in range(1, args.workers + 1):
+            start = time.perf_counter()
+            png = render_parallel(args.size, args.size, draw_func, workers=workers, **options)
+            elapsed = time.perf_counter() - start
+            if baseline is None:
+                baseline, baseline_png = elapsed, png
+            print(f"{workers:>7}  {elapsed:>8.2f}  {baseline / elapsed:>6.2f}x  {png == baseline_png}")
+        return
+
+    if args.stream:
+        if not args.out:
+            parser.error("--stream needs --out")
+        options.pop('indexed')
+        options['band_height'] = args.band_height or STREAM_BAND_HEIGHT
+        start = time.perf_counter()
+        chunks = render_to_file(args.out, args.size, args.size, draw_func, workers=args.workers, **options)
+        # ru_maxrss is in KiB on Linux. The bands are rendered in the workers, so
+        # their peak (the largest of the finished pool processes) is the one that
+        # grows with the band height
+        parent = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024
+        worker = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // 1024
+        print(f"Streamed {args.size}x{args.size} to {args.out} ({chunks} IDAT chunks) with {args.workers} workers "
+              f"in {time.perf_counter() - start:.2f}s, peak RSS {parent} MiB parent, {worker} MiB largest worker")
+        return
+
+    start = time.perf_counter()
+    png = render_parallel(args.size, args.size, draw_func, workers=args.workers, **options)
+    print(f"Rendered {args.size}x{args.size} with {args.workers} workers in {time.perf_counter() - start:.2f}s")
+    if args.out:
+        with open(args.out, 'wb') as f:
+            f.write(png)
+        print(f"Created {args.out}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,373 @@
+import argparse
+import os
+import zlib
+import struct
+
+from culling import background, row_spans
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# Bytes per pixel for the 8-bit color types the generators write
+CHANNELS = {2: 3, 6: 4}
+
+# PNG scanline filter types. 'adaptive' picks one per row with the
+# minimum-sum-of-absolute-differences heuristic from the PNG spec.
+FILTERS = {'none': 0, 'sub': 1, 'up': 2, 'average': 3, 'paeth': 4}
+FILTER_MODES = list(FILTERS) + ['adaptive']
+
+STRATEGIES = {
+    'default': zlib.Z_DEFAULT_STRATEGY,
+    'filtered': zlib.Z_FILTERED,
+    'rle': zlib.Z_RLE,
+    'huffman': zlib.Z_HUFFMAN_ONLY,
+}
+
+# Compressed bytes per IDAT chunk in streaming output (write_png)
+IDAT_CHUNK_SIZE = 1 << 16
+
+# A filtered byte read as signed, i.e. its distance from 0 mod 256
+_ABS_SIGNED = bytes(min(b, 256 - b) for b in range(256))
+
+def png_chunk(chunk_type, data):
+    chunk = chunk_type + data
+    return struct.pack('!I', len(data)) + chunk + struct.pack('!I', zlib.crc32(chunk) & 0xFFFFFFFF)
+
+def assemble_png(width, height, color_type, idat_data, bit_depth=8, palette=None, trns=None):
+    ihdr_content = struct.pack('!IIBBBBB', width, height, bit_depth, color_type, 0, 0, 0)
+    chunks = [PNG_SIGNATURE, png_chunk(b'IHDR', ihdr_content)]
+    if palette is not None:
+        chunks.append(png_chunk(b'PLTE', palette))
+    if trns:
+        chunks.append(png_chunk(b'tRNS', trns))
+    chunks.append(png_chunk(b'IDAT', idat_data))
+    chunks.append(png_chunk(b'IEND', b''))
+    return b''.join(chunks)
+
+def _lane_masks(n):
+    return int.from_bytes(b'\x80' * n, 'big'), int.from_bytes(b'\x7f' * n, 'big')
+
+def _sub_bytes(x, y):
+    # Per-byte (x - y) mod 256 over whole rows, using one big-int subtraction
+    # with the high bits masked so borrows never cross byte lanes
+    n = len(x)
+    high, low = _lane_masks(n)
+    xi, yi = int.from_bytes(x, 'big'), int.from_bytes(y, 'big')
+    return (((xi | high) - (yi & low)) ^ ((xi ^ ~yi) & high)).to_bytes(n, 'big')
+
+def _avg_bytes(x, y):
+    # Per-byte floor((x + y) / 2) without carries between lanes
+    n = len(x)
+    _, low = _lane_masks(n)
+    xi, yi = int.from_bytes(x, 'big'), int.from_bytes(y, 'big')
+    return ((xi & yi) + (((xi ^ yi) >> 1) & low)).to_bytes(n, 'big')
+
+def _paeth_bytes(row, left, up, upleft):
+    out = bytearray(len(row))
+    for i, (x, a, b, c) in enumerate(zip(row, left, up, upleft)):
+        pa, pb, pc = abs(b - c), abs(a - c), abs(a + b - 2 * c)
+        if pa <= pb and pa <= pc:
+            out[i] = (x - a) & 0xFF
+        elif pb <= pc:
+            out[i] = (x - b) & 0xFF
+        else:
+            out[i] = (x - c) & 0xFF
+    return bytes(out)
+
+def filter_row(filter_type, row, prev, bpp):
+    # prev is the previous raw (unfiltered) row, or zeros for the first row
+    row = bytes(row)
+    if filter_type == 0:
+        return row
+    if filter_type == 1:
+        return _sub_bytes(row, bytes(bpp) + row[:-bpp])
+    if filter_type == 2:
+        return _sub_bytes(row, prev)
+    if filter_type == 3:
+        return _sub_bytes(row, _avg_bytes(bytes(bpp) + row[:-bpp], prev))
+    if filter_type == 4:
+        if row == prev:
+            # Paeth predicts b (the byte above) everywhere for a repeated row
+            return bytes(len(row))
+        return _paeth_bytes(row, bytes(bpp) + row[:-bpp], prev, bytes(bpp) + prev[:-bpp])
+    raise ValueError(f"Unknown filter type {filter_type}")
+
+def filtered_scanlines(rows, height, bpp=4, filter_mode='none'):
+    # Prefix each raw row with its filter type byte. With 'none' one line
+    # buffer is reused; the compressor consumes each line before the next.
+    line = None
+    prev = None
+    count = 0
+    for row in rows:
+        count += 1
+        if filter_mode == 'none':
+            if line is None:
+                line = bytearray(1 + len(row))
+            line[1:] = row
+            yield line
+            continue
+        row = bytes(row)
+        if prev is None:
+            prev = bytes(len(row))
+        if filter_mode == 'adaptive':
+            best = None
+            for filter_type in range(5):
+                candidate = filter_row(filter_type, row, prev, bpp)
+                score = sum(candidate.translate(_ABS_SIGNED))
+                if best is None or score < best[0]:
+                    best = (score, filter_type, candidate)
+                if score == 0:
+                    break
+            _, filter_type, filtered = best
+        else:
+            filter_type = FILTERS[filter_mode]
+            filtered = filter_row(filter_type, row, prev, bpp)
+        yield bytes([filter_type]) + filtered
+        prev = row
+    if count != height:
+        raise ValueError(f"Expected {height} rows, got {count}")
+
+def compress_scanlines(blocks, level=-1, strategy='default'):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS, 8, STRATEGIES[strategy])
+    parts = [compressor.compress(block) for block in blocks]
+    parts.append(compressor.flush())
+    return b''.join(parts)
+
+def encode_scanlines(width, height, blocks, color_type=6, level=-1, strategy='default', bit_depth=8,
+                     palette=None, trns=None):
+    # blocks: iterable of already filtered scanline data (filter byte + row),
+    # in image order, e.g. the row bands returned by parallel_render workers
+    return assemble_png(width, height, color_type, compress_scanlines(blocks, level, strategy), bit_depth, palette,
+                        trns)
+
+def encode_png(width, height, rows, color_type=6, level=-1, filter_mode='none', strategy='default', indexed=False):
+    # rows: iterable of raw scanlines (width * channels bytes, no filter byte).
+    # Rows are streamed into the compressor, so memory stays at one scanline
+    # plus the compressed output. indexed=True tries a palette image as well
+    # (see encode_indexed), which needs all rows in memory.
+    if indexed:
+        return encode_indexed(width, height, rows, color_type, level, filter_mode, strategy)
+    scanlines = filtered_scanlines(rows, height, CHANNELS[color_type], filter_mode)
+    return encode_scanlines(width, height, scanlines, color_type, level, strategy)
+
+def write_chunk(f, chunk_type, data):
+    f.write(struct.pack('!I', len(data)))
+    f.write(chunk_type)
+    f.write(data)
+    f.write(struct.pack('!I', zlib.crc32(data, zlib.crc32(chunk_type)) & 0xFFFFFFFF))
+
+def write_scanlines(f, width, height, blocks, color_type=6, level=-1, strategy='default', chunk_size=IDAT_CHUNK_SIZE):
+    # Streaming counterpart of encode_scanlines: compressed data goes to the
+    # open file `f` in IDAT chunks of chunk_size bytes as soon as a chunk is
+    # full, so memory stays at one block plus one chunk whatever the image size
+    f.write(PNG_SIGNATURE)
+    write_chunk(f, b'IHDR', struct.pack('!IIBBBBB', width, height, 8, color_type, 0, 0, 0))
+    compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS, 8, STRATEGIES[strategy])
+    pending = bytearray()
+    idat_chunks = 0
+    for block in blocks:
+        pending += compressor.compress(block)
+        while len(pending) >= chunk_size:
+            write_chunk(f, b'IDAT', bytes(pending[:chunk_size]))
+            del pending[:chunk_size]
+            idat_chunks += 1
+    pending += compressor.flush()
+    for i in range(0, len(pending), chunk_size):
+        write_chunk(f, b'IDAT', bytes(pending[i:i + chunk_size]))
+        idat_chunks += 1
+    write_chunk(f, b'IEND', b'')
+    return idat_chunks
+
+def write_png(path, width, height, rows, color_type=6, level=-1, filter_mode='none', strategy='default',
+              chunk_size=IDAT_CHUNK_SIZE):
+    # Like encode_png, but streamed to a file: nothing holds the whole image,
+    # raw or compressed
+    scanlines = filtered_scanlines(rows, height, CHANNELS[color_type], filter_mode)
+    with open(path, 'wb') as f:
+        return write_scanlines(f, width, height, scanlines, color_type, level, strategy, chunk_size)
+
+# --- Animated PNG ------------------------------------------------------------
+
+def encode_apng(width, height, frames, delay_ms, color_type=6, level=-1, filter_mode='none', plays=0):
+    # frames: list of (x_offset, y_offset, frame_width, frame_height, rows);
+    # the first must cover the whole canvas and becomes the default image.
+    # Every frame replaces its region (blend_op source) and stays until the
+    # next one draws over it (dispose_op none), so later frames only need to
+    # carry the region that changed.
+    x, y, w, h, _ = frames[0]
+    if (x, y, w, h) != (0, 0, width, height):
+        raise ValueError("the first frame must cover the whole image")
+    chunks = [PNG_SIGNATURE,
+              png_chunk(b'IHDR', struct.pack('!IIBBBBB', width, height, 8, color_type, 0, 0, 0)),
+              png_chunk(b'acTL', struct.pack('!II', len(frames), plays))]
+    sequence = 0
+    for i, (x, y, w, h, rows) in enumerate(frames):
+        chunks.append(png_chunk(b'fcTL', struct.pack('!IIIIIHHBB', sequence, w, h, x, y, delay_ms, 1000, 0, 0)))
+        sequence += 1
+        data = compress_scanlines(filtered_scanlines(rows, h, CHANNELS[color_type], filter_mode), level)
+        if i == 0:
+            chunks.append(png_chunk(b'IDAT', data))
+        else:
+            chunks.append(png_chunk(b'fdAT', struct.pack('!I', sequence) + data))
+            sequence += 1
+    chunks.append(png_chunk(b'IEND', b''))
+    return b''.join(chunks)
+
+# --- Palette (color type 3) output -------------------------------------------
+
+def _pixels(row, channels):
+    # Pixels of a raw row as hashable values: one int per RGBA pixel, a tuple per RGB pixel
+    if channels == 4:
+        return memoryview(bytes(row)).cast('I')
+    return zip(row[0::3], row[1::3], row[2::3])
+
+def _pixel_bytes(pixel, channels):
+    return struct.pack('=I', pixel) if channels == 4 else bytes(pixel)
+
+def bit_depth_for(colors):
+    for depth in (1, 2, 4, 8):
+        if colors <= 1 << depth:
+            return depth
+    return None
+
+def pack_indices(indices, depth):
+    # One palette index per byte -> depth-bit samples, high bits first,
+    # the last byte padded with zeros
+    packed = bytes(indices)
+    while depth < 8:
+        if len(packed) % 2:
+            packed += b'\x00'
+        packed = bytes(hi << depth | lo for hi, lo in zip(packed[0::2], packed[1::2]))
+        depth *= 2
+    return packed
+
+def palette_rows(rows, channels, max_colors=256):
+    # -> (palette pixels, index rows) or None when there are more than max_colors.
+    # Colors with alpha < 255 go first, so the tRNS chunk stays short; the
+    # rest of the order is by color, so the output is deterministic.
+    rows = [bytes(row) for row in rows]
+    colors = set()
+    for row in rows:
+        colors.update(_pixels(row, channels))
+        if len(colors) > max_colors:
+            return None
+    def order(pixel):
+        entry = _pixel_bytes(pixel, channels)
+        return entry[3:] == b'\xff' or channels == 3, entry
+    pixels = sorted(colors, key=order)
+    lookup = {pixel: i for i, pixel in enumerate(pixels)}
+    return pixels, [bytes(map(lookup.__getitem__, _pixels(row, channels))) for row in rows]
+
+def encode_palette(width, height, pixels, index_rows, channels, level=-1, filter_mode='none', strategy='default'):
+    depth = bit_depth_for(len(pixels))
+    entries = [_pixel_bytes(p, channels) for p in pixels]
+    palette = b''.join(entry[:3] for entry in entries)
+    trns = b''.join(entry[3:] for entry in entries).rstrip(b'\xff') if channels == 4 else None
+    # Filters work on whole bytes: bpp is 1 for every palette depth
+    packed = (pack_indices(row, depth) for row in index_rows)
+    scanlines = filtered_scanlines(packed, height, 1, filter_mode)
+    return encode_scanlines(width, height, scanlines, 3, level, strategy, depth, palette, trns)
+
+def encode_indexed(width, height, rows, color_type=6, level=-1, filter_mode='none', strategy='default'):
+    # Palette PNG at the lowest bit depth that holds every color (1/2/4/8-bit),
+    # if the image has at most 256 colors and the result is smaller than the
+    # truecolor encoding; otherwise the truecolor PNG
+    channels = CHANNELS[color_type]
+    rows = [bytes(row) for row in rows]
+    truecolor = encode_scanlines(width, height, filtered_scanlines(rows, height, channels, filter_mode),
+                                 color_type, level, strategy)
+    indexed = palette_rows(rows, channels)
+    if indexed is None:
+        return truecolor
+    png = encode_palette(width, height, *indexed, channels, level, filter_mode, strategy)
+    return png if len(png) < len(truecolor) else truecolor
+
+def encode_smallest(width, height, rows, color_type=6):
+    # Brute force: every filter mode x every strategy at level 9, keep the smallest
+    rows = [bytes(row) for row in rows]
+    best = None
+    for filter_mode in FILTER_MODES:
+        # Copy each line: the 'none' path reuses one buffer
+        scanlines = [bytes(line) for line in filtered_scanlines(rows, height, CHANNELS[color_type], filter_mode)]
+        for strategy in STRATEGIES:
+            png = encode_scanlines(width, height, scanlines, color_type, 9, strategy)
+            if best is None or len(png) < len(best[0]):
+                best = (png, filter_mode, strategy)
+    return best
+
+def render_rows(width, height, draw_func, channels, y_start=0, y_stop=None):
+    # One pixel per draw_func call, written into a preallocated row buffer.
+    # Pixels outside the draw function's declared bounds get its background
+    # without a call (see culling.py).
+    row = bytearray(width * channels)
+    spans = row_spans(draw_func, width, height)
+    bg = background(draw_func)
+    fill = None if bg is None else bytes(bg) * width
+    for y in range(y_start, height if y_stop is None else y_stop):
+        if fill is not None:
+            row[:] = fill
+        for start, stop in spans(y):
+            i = start * channels
+            for x in range(start, stop):
+                row[i:i + channels] = draw_func(x, y, width, height)
+                i += channels
+        yield row
+
+def make_png(width, height, draw_func, is_rgba=False, level=-1, filter_mode='none', strategy='default',
+             indexed=False):
+    color_type = 6 if is_rgba else 2
+    rows = render_rows(width, height, draw_func, CHANNELS[color_type])
+    return encode_png(width, height, rows, color_type, level, filter_mode, strategy, indexed)
+
+def png_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith('.png'):
+                    yield os.path.join(path, name)
+        else:
+            yield path
+
+def main():
+    from png_reader import read_png
+
+    # Only the pixel data is re-encoded; ancillary chunks are not carried over
+    parser = argparse.ArgumentParser(description="Report bytes saved by re-encoding PNGs with tuned filter/zlib settings")
+    parser.add_argument('paths', nargs='*', default=['assets/images'])
+    parser.add_argument('--filter', dest='filter_mode', choices=FILTER_MODES, default='adaptive')
+    parser.add_argument('--level', type=int, default=9)
+    parser.add_argument('--strategy', choices=sorted(STRATEGIES), default='default')
+    parser.add_argument('--smallest', action='store_true', help="brute-force every filter mode and strategy")
+    parser.add_argument('--indexed', action='store_true', help="also try a palette PNG (<= 256 colors)")
+    parser.add_argument('--write', action='store_true', help="replace files that got smaller")
+    args = parser.parse_args()
+
+    total_before = total_after = 0
+    for path in png_files(args.paths):
+        name = os.path.basename(path)
+        try:
+            width, height, color_type, rows = read_png(path)
+        except ValueError as e:
+            print(f"{name:<36} skipped: {e}")
+            continue
+        before = os.path.getsize(path)
+        if args.smallest:
+            png, filter_mode, strategy = encode_smallest(width, height, rows, color_type)
+            settings = f"{filter_mode}/{strategy}"
+        else:
+            png = encode_png(width, height, rows, color_type, args.level, args.filter_mode, args.strategy,
+                             args.indexed)
+            settings = ''
+        after = min(before, len(png))
+        total_before += before
+        total_after += after
+        print(f"{name:<36} {before:>9,} -> {after:>9,} bytes  saved {before - after:>8,} "
+              f"({(before - after) / before:.1%}) {settings}")
+        if args.write and len(png) < before:
+            with open(path, 'wb') as f:
+                f.write(png)
+    if total_before:
+        print(f"{'total':<36} {total_before:>9,} -> {total_after:>9,} bytes  saved {total_before - total_after:>8,} "
+              f"({(total_before - total_after) / total_before:.1%})")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+import struct
+import zlib
+
+from png_encoder import CHANNELS, PNG_SIGNATURE
+
+# Samples per pixel for every PNG color type
+# (0 gray, 2 RGB, 3 palette index, 4 gray + alpha, 6 RGBA)
+SAMPLES = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+# Decompressed bytes requested per decompressobj call, so a highly
+# compressible IDAT never inflates into one huge buffer
+READ_SIZE = 1 << 16
+
+class PngHeader:
+    def __init__(self, data):
+        (self.width, self.height, self.bit_depth, self.color_type,
+         _, _, self.interlace) = struct.unpack('!IIBBBBB', data)
+        if self.color_type not in SAMPLES:
+            raise ValueError(f"invalid color type {self.color_type}")
+        bits = SAMPLES[self.color_type] * self.bit_depth
+        self.stride = (self.width * bits + 7) // 8
+        # Filters work on whole bytes: bpp is at least 1
+        self.bpp = max(1, bits // 8)
+
+def read_chunks(f, verify_crc=True):
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        length, chunk_type = struct.unpack('!I4s', header)
+        data = f.read(length)
+        crc = f.read(4)
+        if len(data) < length or len(crc) < 4:
+            raise ValueError(f"truncated {chunk_type.decode('latin-1')} chunk")
+        if verify_crc and struct.unpack('!I', crc)[0] != zlib.crc32(chunk_type + data) & 0xFFFFFFFF:
+            raise ValueError(f"CRC mismatch in {chunk_type.decode('latin-1')} chunk")
+        yield chunk_type, data
+        if chunk_type == b'IEND':
+            return
+
+def _lane_masks(n):
+    return int.from_bytes(b'\x80' * n, 'big'), int.from_bytes(b'\x7f' * n, 'big')
+
+def _add_bytes(x, y):
+    # Per-byte (x + y) mod 256 over whole rows without carries between lanes
+    n = len(x)
+    high, low = _lane_masks(n)
+    xi, yi = int.from_bytes(x, 'big'), int.from_bytes(y, 'big')
+    return (((xi & low) + (yi & low)) ^ ((xi ^ yi) & high)).to_bytes(n, 'big')
+
+def unfilter_row(filter_type, line, prev, bpp):
+    if filter_type == 0:
+        return bytes(line)
+    if filter_type == 2:
+        return _add_bytes(line, prev)
+    if filter_type == 1:
+        # Running sum per byte lane in log2(pixels) whole-row additions:
+        # after the step with shift k, every byte holds the sum of the k
+        # pixels' bytes ending at it
+        n = len(line)
+        high, low = _lane_masks(n)
+        x = int.from_bytes(line, 'big')
+        shift = bpp
+        while shift < n:
+            y = x >> (8 * shift)
+            x = ((x & low) + (y & low)) ^ ((x ^ y) & high)
+            shift *= 2
+        return x.to_bytes(n, 'big')
+    row = bytearray(line)
+    n = len(row)
+    if filter_type == 3:
+        for i in range(n):
+            left = row[i - bpp] if i >= bpp else 0
+            row[i] = (row[i] + ((left + prev[i]) >> 1)) & 0xFF
+    elif filter_type == 4:
+        for i in range(n):
+            a = row[i - bpp] if i >= bpp else 0
+            b = prev[i]
+            c = prev[i - bpp] if i >= bpp else 0
+            pa, pb, pc = abs(b - c), abs(a - c), abs(a + b - 2 * c)
+            if pa <= pb and pa <= pc:
+                pred = a
+            elif pb <= pc:
+                pred = b
+            else:
+                pred = c
+            row[i] = (row[i] + pred) & 0xFF
+    else:
+        raise ValueError(f"Unknown filter type {filter_type}")
+    return bytes(row)
+
+class PngStream:
+    # Streams a PNG: every IDAT chunk is fed to one decompressobj as it is
+    # read, and rows are unfiltered and yielded as soon as they are complete.
+    # Memory stays at the previous row, the current row and one READ_SIZE
+    # block of decompressed data, whatever the image size or IDAT layout.
+
+    def __init__(self, path):
+        self.path = path
+        self.header = None
+        self.palette = None
+        self.trns = None
+        self.idat_count = 0
+        self.chunk_types = []
+
+    def rows(self):
+        with open(self.path, 'rb') as f:
+            if f.read(8) != PNG_SIGNATURE:
+                raise ValueError("not a PNG file")
+            decompressor = zlib.decompressobj()
+            pending = bytearray()
+            prev = None
+            y = 0
+
+            def complete_rows():
+                nonlocal prev, y
+                line_size = self.header.stride + 1
+                while len(pending) >= line_size and y < self.header.height:
+                    row = unfilter_row(pending[0], pending[1:line_size], prev, self.header.bpp)
+                    del pending[:line_size]
+                    yield row
+                    prev = row
+                    y += 1
+
+            for chunk_type, data in read_chunks(f):
+                self.chunk_types.append(chunk_type.decode('latin-1'))
+                if chunk_type == b'IHDR':
+                    self.header = PngHeader(data)
+                    if self.header.interlace:
+                        raise ValueError("interlaced PNGs are not supported")
+                    prev = bytes(self.header.stride)
+                elif chunk_type == b'PLTE':
+                    self.palette = data
+                elif chunk_type == b'tRNS':
+                    self.trns = data
+                elif chunk_type == b'IDAT':
+                    if self.header is None:
+                        raise ValueError("IDAT before IHDR")
+                    self.idat_count += 1
+                    chunk = data
+                    while chunk:
+                        pending += decompressor.decompress(chunk, READ_SIZE)
+                        chunk = decompressor.unconsumed_tail
+                        yield from complete_rows()
+            if self.header is None:
+                raise ValueError("missing IHDR")
+            pending += decompressor.flush()
+            yield from complete_rows()
+            if y < self.header.height:
+                raise ValueError(f"image data ends after {y} of {self.header.height} rows")
+
+def unpack_samples(row, bit_depth, count):
+    # Sub-byte samples (1/2/4-bit) -> one byte per sample
+    if bit_depth == 8:
+        return bytes(row[:count])
+    mask = (1 << bit_depth) - 1
+    out = bytearray()
+    for b in row:
+        for shift in range(8 - bit_depth, -1, -bit_depth):
+            out.append((b >> shift) & mask)
+    return bytes(out[:count])
+
+def alpha_row(stream, row):
+    # Per-pixel alpha of one unfiltered row, scaled to 0..255
+    # (a 16-bit alpha counts as 0/255 only when it is exactly 0/65535)
+    header = stream.header
+    width, depth, color_type = header.width, header.bit_depth, header.color_type
+    if color_type in (4, 6):
+        samples = SAMPLES[color_type]
+        if depth == 8:
+            return row[samples - 1::samples]
+        values = struct.unpack(f'>{width * samples}H', row)[samples - 1::samples]
+        return bytes(0 if v == 0 else 255 if v == 0xFFFF else 128 for v in values)
+    if color_type == 3:
+        table = bytearray(b'\xff' * 256)
+        if stream.trns:
+            table[:len(stream.trns)] = stream.trns
+        return unpack_samples(row, depth, width).translate(bytes(table))
+    if stream.trns is None:
+        return b'\xff' * width
+    # Gray/RGB with a tRNS key color: exact matches are transparent
+    samples = SAMPLES[color_type]
+    key = struct.unpack(f'>{samples}H', stream.trns)
+    if depth == 16:
+        values = struct.unpack(f'>{width * samples}H', row)
+    else:
+        values = unpack_samples(row, depth, width * samples)
+    return bytes(0 if tuple(values[i:i + samples]) == key else 255 for i in range(0, width * samples, samples))
+
+def alpha_stats(path):
+    stream = PngStream(path)
+    transparent = opaque = 0
+    left = top = right = bottom = None
+    for y, row in enumerate(stream.rows()):
+        alpha = alpha_row(stream, row)
+        zeros = alpha.count(0)
+        transparent += zeros
+        opaque += alpha.count(255)
+        if zeros < len(alpha):
+            # Bounding box of pixels that are not fully transparent
+            first = len(alpha) - len(alpha.lstrip(b'\x00'))
+            last = len(alpha.rstrip(b'\x00')) - 1
+            left = first if left is None else min(left, first)
+            right = last if right is None else max(right, last)
+            top = y if top is None else top
+            bottom = y
+    header = stream.header
+    total = header.width * header.height
+    return {
+        'width': header.width,
+        'height': header.height,
+        'bit_depth': header.bit_depth,
+        'color_type': header.color_type,
+        'idat_chunks': stream.idat_count,
+        'chunks': stream.chunk_types,
+        'transparent': transparent,
+        'opaque': opaque,
+        'partial': total - transparent - opaque,
+        'bbox': None if top is None else (left, top, right, bottom),
+    }
+
+def expand_palette(stream, row):
+    # Palette indices -> RGB, or RGBA when the image has a tRNS chunk
+    indices = unpack_samples(row, stream.header.bit_depth, stream.header.width)
+    palette = stream.palette
+    if stream.trns is None:
+        return b''.join(palette[i * 3:i * 3 + 3] for i in indices)
+    alpha = stream.trns + b'\xff' * (256 - len(stream.trns))
+    return b''.join(palette[i * 3:i * 3 + 3] + alpha[i:i + 1] for i in indices)
+
+def pixel_rows(stream):
+    # Stream an 8-bit RGB/RGBA or palette (1/2/4/8-bit), non-interlaced PNG as
+    # raw RGB/RGBA rows; stream.header is set once the first row is out
+    for row in stream.rows():
+        header = stream.header
+        if header.color_type == 3:
+            yield expand_palette(stream, row)
+            continue
+        if header.bit_depth != 8 or header.color_type not in CHANNELS:
+            raise ValueError(f"unsupported format (bit depth {header.bit_depth}, color type {header.color_type})")
+        yield row
+
+def pixel_color_type(stream):
+    # Color type of the rows pixel_rows yields
+    if stream.header.color_type == 3:
+        return 2 if stream.trns is None else 6
+    return stream.header.color_type
+
+def read_png(path):
+    # pixel_rows of a whole file -> (width, height, color type, rows)
+    stream = PngStream(path)
+    rows = list(pixel_rows(stream))
+    return stream.header.width, stream.header.height, pixel_color_type(stream), rows
@@ -0,0 +1,185 @@
+import argparse
+import linecache
+import os
+import sys
+import time
+from collections import Counter
+
+import separable
+import supersample
+from build_assets import load_manifest
+from parallel_render import load_draw
+from png_encoder import CHANNELS, encode_scanlines, filtered_scanlines, render_rows
+
+# Opt-in profiling for the shared render loop (png_encoder.render_rows,
+# supersample.uniform_rows / adaptive_rows -> filtered_scanlines -> zlib).
+# Nothing in those loops checks for a profiler: a RenderProfile wraps the
+# draw function, swaps supersample.blend for a timed copy while it is active,
+# and times the row and scanline generators from the outside. With no
+# profile active the render path is exactly the normal one.
+#
+# Phases:
+#   draw      inside the draw_* callback, or its row/column terms and
+#             combine() when it is split (separable.py)
+#   blend     supersample averaging (supersampled renders only)
+#   pack      the rest of the row loop: sample grids, tuple -> row bytes
+#   filter    PNG scanline filtering
+#   compress  zlib
+#
+# Region hits count, per `return` line of the draw function, how many
+# evaluations ended there. They come from sys.setprofile, which slows every
+# call down, so they are collected in a separate render from the timings.
+
+PHASES = ('draw', 'blend', 'pack', 'filter', 'compress')
+
+class RenderProfile:
+    def __init__(self):
+        self.times = dict.fromkeys(PHASES, 0.0)
+        self.draw_calls = 0
+        self.pixels = 0
+        self.region_hits = Counter()
+        self._draw_codes = set()
+        self._saved_blend = None
+        self._regions = False
+
+    def wrap_draw(self, draw_func):
+        # Keeps the bounds and separable split of draw_func (see
+        # separable.wrap_draw), so the profiled loop is the one that ships
+        clock = time.perf_counter
+        times = self.times
+        self._draw_codes.add(draw_func.__code__)
+
+        def timed(func, sample):
+            def timed_draw(*args):
+                start = clock()
+                color = func(*args)
+                times['draw'] += clock() - start
+                if sample:
+                    self.draw_calls += 1
+                return color
+            return timed_draw
+        return separable.wrap_draw(draw_func, timed)
+
+    def timed(self, iterable, phase):
+        # Time spent producing each item of `iterable`
+        clock = time.perf_counter
+        iterator = iter(iterable)
+        while True:
+            start = clock()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.times[phase] += clock() - start
+                return
+            self.times[phase] += clock() - start
+            yield item
+
+    def regions(self, draw_func):
+        # Count region hits of draw_func while the profile is active. The
+        # separable split is off, so every sample runs draw_func's own returns
+        self._draw_codes.add(draw_func.__code__)
+        self._regions = True
+        return separable.wrap_draw(draw_func, lambda func, sample: lambda *args: func(*args), split=False)
+
+    def _hook(self, frame, event, arg):
+        if event == 'return' and frame.f_code in self._draw_codes:
+            self.region_hits[(frame.f_code.co_filename, frame.f_lineno)] += 1
+
+    def __enter__(self):
+        clock = time.perf_counter
+        times = self.times
+        blend = self._saved_blend = supersample.blend
+
+        def timed_blend(samples, empty):
+            start = clock()
+            color = blend(samples, empty)
+            times['blend'] += clock() - start
+            return color
+        supersample.blend = timed_blend
+        if self._regions:
+            sys.setprofile(self._hook)
+        return self
+
+    def __exit__(self, *exc):
+        if self._regions:
+            sys.setprofile(None)
+        supersample.blend = self._saved_blend
+        return False
+
+def region_label(filename, lineno):
+    # The return line, prefixed by the block header above it when it is a bare return
+    line = linecache.getline(filename, lineno).strip()
+    if line.startswith('return'):
+        previous = linecache.getline(filename, lineno - 1).split('#')[0].strip()
+        if previous.endswith(':'):
+            line = f"{previous} {line}"
+    return line
+
+def asset_rows(asset, size, draw_func, adaptive):
+    if asset.get('sampling'):
+        ss, offset, empty = supersample.SAMPLING[asset['sampling']]
+        if adaptive:
+            return 6, supersample.adaptive_rows(size, size, draw_func, ss * ss, offset, empty)
+        return 6, supersample.uniform_rows(size, size, draw_func, ss, offset, empty)
+    color_type = asset['color_type']
+    return color_type, render_rows(size, size, draw_func, CHANNELS[color_type])
+
+def profile_asset(asset, size, adaptive=False):
+    profile = RenderProfile()
+    draw_func = profile.wrap_draw(load_draw(asset['draw']))
+    with profile:
+        start = time.perf_counter()
+        color_type, rows = asset_rows(asset, size, draw_func, adaptive)
+        rows = profile.timed(rows, 'pack')
+        blocks = profile.timed(filtered_scanlines(rows, size, CHANNELS[color_type],
+                                                  asset.get('filter_mode', 'none')), 'filter')
+        png = encode_scanlines(size, size, blocks, color_type, asset.get('level', -1),
+                               asset.get('strategy', 'default'))
+        total = time.perf_counter() - start
+    times = profile.times
+    # Nested generators: each measured phase includes the ones inside it
+    render = times['pack']
+    times['compress'] = total - times['filter']
+    times['filter'] -= render
+    times['pack'] = render - times['draw'] - times['blend']
+    profile.pixels = size * size
+    return profile, total, len(png)
+
+def region_counts(asset, size, adaptive=False):
+    profile = RenderProfile()
+    draw_func = profile.regions(load_draw(asset['draw']))
+    with profile:
+        _, rows = asset_rows(asset, size, draw_func, adaptive)
+        for _ in rows:
+            pass
+    return profile.region_hits
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile the render loop of generated assets by phase and region")
+    parser.add_argument('assets', nargs='*', help="asset file names (default: all in asset_manifest.json)")
+    parser.add_argument('--size', type=int, default=256, help="canvas size")
+    parser.add_argument('--adaptive', action='store_true', help="profile adaptive supersampling")
+    parser.add_argument('--regions', action='store_true', help="also count evaluations per draw-function return")
+    args = parser.parse_args()
+
+    for asset in load_manifest():
+        name = os.path.basename(asset['output'])
+        if args.assets and name not in args.assets:
+            continue
+        profile, total, size_bytes = profile_asset(asset, args.size, args.adaptive)
+        print(f"{name} @ {args.size}px: {total:.2f}s, {profile.draw_calls / profile.pixels:.2f} samples/pixel, "
+              f"{size_bytes:,} bytes")
+        for phase in PHASES:
+            seconds = profile.times[phase]
+            if seconds:
+                print(f"  {phase:<9} {seconds:>8.3f}s  {seconds / total:>6.1%}")
+        if args.regions:
+            hits = region_counts(asset, args.size, args.adaptive)
+            evaluations = sum(hits.values())
+            print(f"  regions ({evaluations:,} evaluations):")
+            for (filename, lineno), count in hits.most_common():
+                print(f"    {count:>10,}  {count / evaluations:>6.1%}  "
+                      f"{os.path.basename(filename)}:{lineno}  {region_label(filename, lineno)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,405 @@
+import argparse
+import importlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import Pool
+
+from build_assets import ROOT, load_manifest
+from contact_sheet import preview_pixels
+from supersample import SAMPLING
+from themes import colorize, coverage_mask, default_themes, parse_theme, transparent_rgb
+from vector_render import encode_array, render_array, supersample_array
+from vectorize import Unsupported, vectorize
+
+# Local render server for design iteration. It stays up between edits, so the
+# imported generators, compiled draw functions (vectorize.py), coordinate
+# grids, finished renders, their coverage masks (themes.py) and a worker pool
+# are reused instead of rebuilt by every `python create_v5_splash.py`.
+#
+#   python render_daemon.py                      # 127.0.0.1:8765, watches the generators
+#   curl -s localhost:8765/render -o v5.png -H 'Content-Type: application/json' \
+#       -d '{"draw": "create_v5_splash:draw_legendary_coffee_v5", "size": 1024, "sampling": "v5",
+#            "overrides": {"steam_amp": 0.2}}'
+#   curl -s localhost:8765/render -o v5_dark.png -H 'Content-Type: application/json' \
+#       -d '{"asset": "splash_v5_pro_transparent.png", "preview": 256, "theme": "dark"}'
+#   curl -s localhost:8765/status
+#
+# POST /render takes a JSON job and answers with the PNG:
+#   asset      manifest file name; supplies draw, size and sampling
+#   draw       'module:draw_function' of a generator script in the repo root
+#              (instead of asset)
+#   size       canvas size, 1..8192 (default: the asset's, else 1024); a render
+#              without preview is at most 2048px and 2^24 samples (1024px at 4x4)
+#   sampling   'hq' / 'v5' supersampling (see supersample.SAMPLING)
+#   overrides  {local name: number} for the draw function (see vectorize.compile_draw)
+#   preview    render the canvas at this many px instead (2x2 samples), 1..2048
+#   theme      a themes.default_themes() name or FG[:BG] as in themes.py
+#   level      zlib level (default 6)
+#
+# Jobs must be sent as Content-Type: application/json, and requests carrying
+# an Origin header are refused: the daemon serves no pages, so those come
+# from a web page in a browser, which must not be able to run renders.
+#
+# Finished renders and coverage masks are kept up to CACHE_BYTES each, least
+# recently used first out.
+#
+# Every generator module behind the manifest (and any draw requested since)
+# is polled for edits. An edit reloads the module, writes a --preview px
+# render of each changed asset to build/daemon/<name>_preview.png right away
+# and a full-size one to build/daemon/<name>.png from the worker pool; a newer
+# edit supersedes a full render still in flight. The last /render job of the
+# module is rendered again to build/daemon/<module>_last_job.png. The asset
+# files themselves are left to build_assets.py.
+
+OUT_DIR = os.path.join(ROOT, 'build', 'daemon')
+PREVIEW_SAMPLES = 2
+MAX_SIZE = 8192           # canvas size; only a preview makes large canvases affordable
+MAX_RENDER = 2048         # rendered width and height
+MAX_SAMPLES = 1 << 24     # draw samples of one render
+CACHE_BYTES = 512 << 20   # per render cache
+LOADED = {}   # module name -> mtime of the source it was (re)loaded from
+LOAD_LOCK = threading.Lock()   # handler threads and the watch thread both (re)load
+
+def check_spec(spec):
+    # Only draw_* functions defined in the generator scripts of the repo root
+    # are importable through a job
+    module_name, _, name = spec.partition(':')
+    path = os.path.join(ROOT, f"{module_name}.py")
+    if module_name.isidentifier() and name.startswith('draw_') and os.path.isfile(path):
+        with open(path) as f:
+            if re.search(rf'^def {re.escape(name)}\(', f.read(), re.MULTILINE):
+                return spec
+    raise ValueError(f"draw {spec!r} is not a draw_* function of a generator script in {ROOT}")
+
+def check_size(job, key, default=None, limit=MAX_SIZE):
+    value = job.get(key, default)
+    if value is None:
+        return None
+    value = int(value)
+    if not 1 <= value <= limit:
+        raise ValueError(f"{key} must be 1..{limit}, got {value}")
+    return value
+
+CacheInfo = namedtuple('CacheInfo', 'hits misses entries bytes max_bytes')
+
+class ByteCache:
+    # lru_cache bounded by the total size of the cached arrays instead of
+    # their number
+    def __init__(self, func, max_bytes):
+        self.func, self.max_bytes = func, max_bytes
+        self.entries = OrderedDict()   # key -> (value, bytes)
+        self.bytes = self.hits = self.misses = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, *key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key][0]
+            self.misses += 1
+        value = self.func(*key)
+        size = sum(getattr(part, 'nbytes', 0) for part in (value if isinstance(value, tuple) else (value,)))
+        with self.lock:
+            if key not in self.entries and size <= self.max_bytes:
+                self.entries[key] = (value, size)
+                self.bytes += size
+                while self.bytes > self.max_bytes:
+                    _, (_, evicted) = self.entries.popitem(last=False)
+                    self.bytes -= evicted
+        return value
+
+    def cache_info(self):
+        with self.lock:
+            return CacheInfo(self.hits, self.misses, len(self.entries), self.bytes, self.max_bytes)
+
+def byte_cache(max_bytes):
+    return lambda func: ByteCache(func, max_bytes)
+
+def load_fresh(spec):
+    # load_draw that re-imports the module when its file changed since
+    module_name, name = spec.split(':')
+    with LOAD_LOCK:
+        module = importlib.import_module(module_name)
+        mtime = os.stat(module.__file__).st_mtime_ns
+        if LOADED.setdefault(module_name, mtime) != mtime:
+            module = importlib.reload(module)
+            LOADED[module_name] = mtime
+    return getattr(module, name), mtime
+
+# The caches key on the module's mtime, so an edit never serves a stale render
+
+@lru_cache(maxsize=64)
+def compiled(spec, mtime, overrides):
+    func, _ = load_fresh(spec)
+    return vectorize(func, dict(overrides))
+
+@byte_cache(CACHE_BYTES)
+def pixels(spec, mtime, overrides, size, sampling, preview):
+    draw = compiled(spec, mtime, overrides)
+    if preview:
+        return preview_pixels(draw, size, preview, PREVIEW_SAMPLES)
+    if sampling:
+        return supersample_array(size, size, draw, SAMPLING[sampling])
+    return render_array(size, size, draw)
+
+@byte_cache(CACHE_BYTES)
+def coverage(spec, mtime, overrides, size, sampling, preview):
+    # -> (coverage, design foreground, RGB of transparent pixels)
+    rendered = pixels(spec, mtime, overrides, size, sampling, preview)
+    return coverage_mask(rendered) + (transparent_rgb(rendered),)
+
+def parse_job(job, assets):
+    # JSON job -> (spec, overrides, size, sampling, preview, theme, level)
+    if 'asset' in job:
+        if job['asset'] not in assets:
+            raise ValueError(f"unknown asset {job['asset']!r}")
+        job = {**assets[job['asset']], **job}
+    if 'draw' not in job:
+        raise ValueError("a job needs 'draw' or 'asset'")
+    spec = check_spec(job['draw'])
+    sampling = job.get('sampling')
+    if sampling is not None and sampling not in SAMPLING:
+        raise ValueError(f"sampling must be one of {', '.join(SAMPLING)}")
+    theme = job.get('theme')
+    if theme is not None:
+        themes = default_themes()
+        theme = themes[theme] if theme in themes else parse_theme(f"job={theme}")[1]
+    level = int(job.get('level', 6))
+    if not -1 <= level <= 9:
+        raise ValueError(f"level must be -1..9, got {level}")
+    size, preview = check_size(job, 'size', 1024), check_size(job, 'preview', limit=MAX_RENDER)
+    if preview is None:
+        if size > MAX_RENDER:
+            raise ValueError(f"size {size} is over {MAX_RENDER}px; ask for a preview of it")
+        samples = size * size * (SAMPLING[sampling][0] ** 2 if sampling else 1)
+        if samples > MAX_SAMPLES:
+            raise ValueError(f"{size}px with {sampling} sampling is {samples:,} samples, over {MAX_SAMPLES:,}")
+    overrides = tuple(sorted(job.get('overrides', {}).items()))
+    return spec, overrides, size, sampling, preview, theme, level
+
+def render_job(job, assets):
+    # -> (PNG bytes, served from the render cache)
+    spec, overrides, size, sampling, preview, theme, level = parse_job(job, assets)
+    _, mtime = load_fresh(spec)
+    key = (spec, mtime, overrides, size, sampling, preview)
+    hits = pixels.cache_info().hits
+    if theme is None:
+        result = pixels(*key)
+    else:
+        mask, design_fg, empty = coverage(*key)
+        fg, bg = theme
+        result = colorize(mask, fg or design_fg, bg, empty)
+    return encode_array(result, level), pixels.cache_info().hits > hits
+
+def render_full(job):
+    # Worker: full-size render of a manifest asset, encoded with its settings
+    asset, generation = job
+    start = time.perf_counter()
+    func, _ = load_fresh(asset['draw'])
+    draw = vectorize(func)
+    if asset.get('sampling'):
+        result = supersample_array(asset['size'], asset['size'], draw, SAMPLING[asset['sampling']])
+    else:
+        result = render_array(asset['size'], asset['size'], draw)
+    png = encode_array(result, asset.get('level', -1), asset.get('filter_mode', 'none'),
+                       asset.get('strategy', 'default'), asset.get('indexed', False))
+    return asset, generation, png, time.perf_counter() - start
+
+class Daemon:
+    def __init__(self, workers, preview, interval):
+        self.assets = {os.path.basename(a['output']): a for a in load_manifest()}
+        self.preview = preview
+        self.interval = interval
+        self.pool = Pool(workers)
+        self.lock = threading.Lock()
+        self.generations = {}     # asset name -> number of the latest edit
+        self.last_jobs = {}       # module name -> last /render job that drew from it
+        self.events = deque(maxlen=50)
+        self.started = time.time()
+        self.watched = {}         # module name -> source file mtime
+        for asset in self.assets.values():
+            self.watch(asset['draw'])
+
+    def log(self, message, **fields):
+        print(message, flush=True)
+        with self.lock:
+            self.events.append({'time': round(time.time(), 3), 'message': message, **fields})
+
+    def watch(self, spec):
+        module_name = check_spec(spec).split(':')[0]
+        with self.lock:
+            if module_name in self.watched:
+                return
+        _, mtime = load_fresh(spec)
+        with self.lock:
+            self.watched.setdefault(module_name, mtime)
+
+    def remember(self, job):
+        spec = parse_job(job, self.assets)[0]
+        with self.lock:
+            self.last_jobs[spec.split(':')[0]] = job
+
+    def status(self):
+        with self.lock:
+            return {
+                'uptime': round(time.time() - self.started, 1),
+                'watching': sorted(f"{m}.py" for m in self.watched),
+                'caches': {name: cache.cache_info()._asdict()
+                           for name, cache in (('compiled', compiled), ('pixels', pixels), ('coverage', coverage))},
+                'events': list(self.events),
+            }
+
+    def changed_modules(self):
+        changed = []
+        with self.lock:
+            for module_name, mtime in self.watched.items():
+                try:
+                    current = os.stat(os.path.join(ROOT, f"{module_name}.py")).st_mtime_ns
+                except OSError:
+                    continue
+                if current != mtime:
+                    self.watched[module_name] = current
+                    changed.append(module_name)
+        return changed
+
+    def on_edit(self, module_name):
+        for name, asset in self.assets.items():
+            if asset['draw'].split(':')[0] != module_name:
+                continue
+            stem = os.path.splitext(name)[0]
+            start = time.perf_counter()
+            try:
+                spec, _, size, sampling, _, _, _ = parse_job({'asset': name}, self.assets)
+                _, mtime = load_fresh(spec)
+                preview = pixels(spec, mtime, (), size, sampling, self.preview)
+            except Exception as e:
+                # A half-finished edit: report it and wait for the next save
+                self.log(f"{name}: {type(e).__name__}: {e}", asset=name, error=True)
+                continue
+            path = os.path.join(OUT_DIR, f"{stem}_preview.png")
+            with open(path, 'wb') as f:
+                f.write(encode_array(preview, 1))
+            self.log(f"{name}: {self.preview}px preview in {time.perf_counter() - start:.2f}s -> {path}",
+                     asset=name, preview=path)
+            with self.lock:
+                generation = self.generations[name] = self.generations.get(name, 0) + 1
+            self.pool.apply_async(render_full, ((asset, generation),), callback=self.on_full,
+                                  error_callback=lambda e, n=name: self.log(f"{n}: full render failed: {e}",
+                                                                            asset=n, error=True))
+        with self.lock:
+            job = self.last_jobs.get(module_name)
+        if job is not None:
+            start = time.perf_counter()
+            try:
+                png, _ = render_job(job, self.assets)
+            except Exception as e:
+                self.log(f"{module_name}: last job: {type(e).__name__}: {e}", module=module_name, error=True)
+                return
+            path = os.path.join(OUT_DIR, f"{module_name}_last_job.png")
+            with open(path, 'wb') as f:
+                f.write(png)
+            self.log(f"{module_name}: last job in {time.perf_counter() - start:.2f}s -> {path}",
+                     module=module_name, job=path)
+
+    def on_full(self, result):
+        asset, generation, png, seconds = result
+        name = os.path.basename(asset['output'])
+        with self.lock:
+            current = self.generations.get(name) == generation
+        if not current:
+            return
+        path = os.path.join(OUT_DIR, name)
+        with open(path, 'wb') as f:
+            f.write(png)
+        self.log(f"{name}: full {asset['size']}px render in {seconds:.2f}s -> {path}", asset=name, full=path)
+
+    def watch_loop(self):
+        while True:
+            time.sleep(self.interval)
+            for module_name in self.changed_modules():
+                self.on_edit(module_name)
+
+def handler(daemon):
+    class Handler(BaseHTTPRequestHandler):
+        def reply(self, code, body, content_type, headers=()):
+            self.send_response(code)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            for key, value in headers:
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def reply_json(self, code, value):
+            self.reply(code, json.dumps(value, indent=2).encode() + b'\n', 'application/json')
+
+        def do_GET(self):
+            if self.path == '/status':
+                self.reply_json(200, daemon.status())
+            else:
+                self.reply_json(404, {'error': f"unknown path {self.path}; use GET /status or POST /render"})
+
+        def do_POST(self):
+            if self.path != '/render':
+                self.reply_json(404, {'error': f"unknown path {self.path}"})
+                return
+            if 'Origin' in self.headers:
+                self.reply_json(403, {'error': "requests from web pages (with an Origin header) are refused"})
+                return
+            if self.headers.get_content_type() != 'application/json':
+                self.reply_json(415, {'error': "send the job as Content-Type: application/json"})
+                return
+            start = time.perf_counter()
+            try:
+                job = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                if 'draw' in job:
+                    daemon.watch(job['draw'])
+                png, cached = render_job(job, daemon.assets)
+                daemon.remember(job)
+            except (ValueError, KeyError, TypeError, AttributeError, ImportError, SyntaxError, Unsupported,
+                    argparse.ArgumentTypeError) as e:
+                self.reply_json(400, {'error': f"{type(e).__name__}: {e}"})
+                return
+            except (MemoryError, OSError) as e:
+                self.reply_json(500, {'error': f"{type(e).__name__}: {e}"})
+                return
+            self.reply(200, png, 'image/png', [('X-Render-Seconds', f"{time.perf_counter() - start:.3f}"),
+                                               ('X-Render-Cache', 'hit' if cached else 'miss')])
+
+        def log_message(self, format, *args):
+            pass
+    return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description="Local render server with warm caches and live previews of edits")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="processes for full-size renders")
+    parser.add_argument('--preview', type=int, default=256, help="preview size written on every edit")
+    parser.add_argument('--interval', type=float, default=0.5, help="seconds between checks for edits")
+    args = parser.parse_args()
+
+    os.makedirs(OUT_DIR, exist_ok=True)
+    # The pool is forked before any thread starts
+    daemon = Daemon(args.workers, args.preview, args.interval)
+    server = ThreadingHTTPServer((args.host, args.port), handler(daemon))
+    threading.Thread(target=daemon.watch_loop, daemon=True).start()
+    print(f"Serving on http://{args.host}:{args.port} (POST /render, GET /status); "
+          f"watching {len(daemon.watched)} generator files, previews in {OUT_DIR}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        daemon.pool.terminate()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+from build_assets import load_manifest
+from parallel_render import load_draw
+from supersample import SAMPLING
+from vector_render import coordinate_grid, encode_array, supersample_array
+from vectorize import vectorize
+
+# Signed-distance shape library. Every primitive returns the distance from
+# (x, y) to the shape outline, negative inside, in the units of its inputs;
+# the inputs can be NumPy arrays of any broadcastable shape. Shapes combine
+# with union / intersect / subtract, and coverage() turns a distance into an
+# anti-aliased alpha from a single evaluation per pixel: a pixel is treated
+# as a box of side `pixel` straddling a locally straight edge.
+#
+# The ellipse and sine-path distances are first-order approximations (exact
+# on the outline, proportional nearby), which is all coverage needs.
+
+def union(*shapes):
+    return np.minimum.reduce(np.broadcast_arrays(*shapes))
+
+def intersect(*shapes):
+    return np.maximum.reduce(np.broadcast_arrays(*shapes))
+
+def subtract(shape, *holes):
+    return intersect(shape, *(-hole for hole in holes))
+
+def half_plane(x, y, a, b, c):
+    # Inside where a*x + b*y + c < 0
+    return (a * x + b * y + c) / np.hypot(a, b)
+
+def box(x, y, cx, cy, half_w, half_h):
+    qx, qy = np.abs(x - cx) - half_w, np.abs(y - cy) - half_h
+    outside = np.hypot(np.maximum(qx, 0), np.maximum(qy, 0))
+    return outside + np.minimum(np.maximum(qx, qy), 0)
+
+def ellipse(x, y, cx, cy, rx, ry):
+    # |p/r| (|p/r| - 1) / |p/r^2|
+    px, py = x - cx, y - cy
+    k0 = np.hypot(px / rx, py / ry)
+    k1 = np.hypot(px / (rx * rx), py / (ry * ry))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        d = k0 * (k0 - 1) / k1
+    return np.where(k1 > 0, d, -min(rx, ry))
+
+def circle(x, y, cx, cy, r):
+    return np.hypot(x - cx, y - cy) - r
+
+def ring(x, y, cx, cy, r_inner, r_outer, aspect=1.0):
+    # Between two concentric ellipses; aspect = x radius / y radius
+    return subtract(ellipse(x, y, cx, cy, r_outer * aspect, r_outer),
+                    ellipse(x, y, cx, cy, r_inner * aspect, r_inner))
+
+def triangle(x, y, p0, p1, p2):
+    # Exact distance to a triangle (any winding)
+    points = [np.asarray(p, dtype=np.float64) for p in (p0, p1, p2)]
+    e = [points[(i + 1) % 3] - points[i] for i in range(3)]
+    v = [(x - points[i][0], y - points[i][1]) for i in range(3)]
+    winding = np.sign(e[0][0] * e[2][1] - e[0][1] * e[2][0])
+    dist2, side = None, None
+    for (ex, ey), (vx, vy) in zip(e, v):
+        t = np.clip((vx * ex + vy * ey) / (ex * ex + ey * ey), 0, 1)
+        d2 = (vx - ex * t) ** 2 + (vy - ey * t) ** 2
+        s = winding * (vx * ey - vy * ex)
+        dist2 = d2 if dist2 is None else np.minimum(dist2, d2)
+        side = s if side is None else np.minimum(side, s)
+    return -np.sqrt(dist2) * np.sign(side)
+
+def sine_capsule(x, y, x0, amplitude, frequency, y0, y1, radius, phase=0.0):
+    # Stroke along x = x0 + amplitude * sin(frequency * y + phase) for
+    # y0 <= y <= y1, `radius` wide on each side of the path measured along x
+    # (like the |x - path| < radius tests in the draw functions), round caps
+    yc = np.clip(y, y0, y1)
+    path = x0 + amplitude * np.sin(frequency * yc + phase)
+    slope = amplitude * frequency * np.cos(frequency * yc + phase)
+    inside = (y >= y0) & (y <= y1)
+    along = (np.abs(x - path) - radius) / np.sqrt(1 + slope * slope)
+    cap = np.hypot(x - path, y - yc) - radius
+    return np.where(inside, along, cap)
+
+def coverage(d, pixel=1.0):
+    return np.clip(0.5 - d / pixel, 0.0, 1.0)
+
+# --- Designs -----------------------------------------------------------------
+# Distances are returned in pixels of a w x h canvas.
+
+def v15_bean(x, y, w, h, transparent=False):
+    # apply_v15.py: bean ellipse with a slit and an eyelet cut out of it,
+    # in a space scaled by (sx, sy) around the canvas centre
+    cx, cy = w/2, h/2
+    if transparent:
+        sx, sy, r, slit_w, slit_end, hole_y, hole_r = 0.6, 0.8, 250, 15, 80, 100, 25
+    else:
+        sx, sy, r, slit_w, slit_end, hole_y, hole_r = 0.8, 1.2, 280, 12, 100, 120, 30
+    bean = ellipse(x, y, cx, cy, r * sx, r * sy)
+    # The slit runs from above the bean down to slit_end
+    top = -r - slit_w
+    slit = box(x, y, cx, cy + (slit_end + top) * sy / 2, slit_w * sx, (slit_end - top) * sy / 2)
+    hole = ellipse(x, y, cx, cy + hole_y * sy, hole_r * sx, hole_r * sy)
+    return subtract(bean, slit, hole)
+
+def v5_coffee(x, y, w, h):
+    # create_v5_splash.py: cup, handle, saucer, steam and pen nib, built in the
+    # design's normalized space (1 unit = w * 0.55 / 2 pixels)
+    unit = w * 0.55 / 2
+    nx, ny = (x - w/2) / unit, (y - h/2 * 1.08) / (h * 0.55 / 2)
+
+    cup_band = intersect(half_plane(nx, ny, 0, -1, -0.1), half_plane(nx, ny, 0, 1, -0.4))
+    body = intersect(
+        cup_band,
+        half_plane(np.abs(nx), ny, 1, 0.2, -0.7),
+        union(half_plane(nx, ny, 0, 1, -0.3), circle(nx, ny, 0, 0.1, np.sqrt(0.3))),
+    )
+    bowl = intersect(ellipse(nx, ny, 0, 0, np.sqrt(0.45), np.sqrt(0.45) * 0.8), cup_band)
+    handle = intersect(ring(nx, ny, 0.65, 0.15, 0.2, np.sqrt(0.12)), half_plane(nx, ny, -1, 0, 0.65))
+    saucer = intersect(ellipse(nx, ny, 0, 0.55, 1.1 * np.sqrt(0.4), 0.2 * np.sqrt(0.4)),
+                       half_plane(nx, ny, 0, -1, 0.55), half_plane(nx, ny, 0, 1, -0.65))
+    # Steam: x = 0.12 sin(4.5 (ny + 0.5)) for -1.4 < ny < -0.4, cut flat at both ends
+    steam = intersect(sine_capsule(nx, ny, 0, 0.12, 4.5, -1.4, -0.4, 0.04, phase=2.25),
+                      half_plane(nx, ny, 0, -1, -1.4), half_plane(nx, ny, 0, 1, 0.4))
+
+    px, py = 0.12 * np.sin(-0.9 * 4.5), -0.95
+    nib = intersect(
+        box(nx, ny, px, py + 0.125, 0.22, 0.275),
+        triangle(nx, ny, (px, py + 0.4), (px - 0.242, py - 0.15), (px + 0.242, py - 0.15)),
+    )
+    slit = box(nx, ny, px, py - 0.025, 0.015, 0.175)
+    hole = circle(nx, ny, px, py + 0.2, np.sqrt(0.0015))
+    nib = subtract(nib, slit, hole)
+
+    return union(body, bowl, handle, saucer, steam, nib) * unit
+
+def solid(cov, fg, bg):
+    fg, bg = np.asarray(fg, dtype=np.float64), np.asarray(bg, dtype=np.float64)
+    return np.rint(bg + (fg - bg) * cov[..., np.newaxis]).astype(np.uint8)
+
+def layer(cov, color, empty=(0, 0, 0, 0)):
+    alpha = np.rint(cov * 255).astype(np.uint8)
+    out = np.empty(cov.shape + (4,), dtype=np.uint8)
+    out[...] = empty
+    out[alpha > 0, :3] = color
+    out[..., 3] = np.where(alpha > 0, alpha, empty[3])
+    return out
+
+def draw_v15_solid(x, y, w, h):
+    return solid(coverage(v15_bean(x, y, w, h)), (212, 175, 55), (43, 27, 23))
+
+def draw_v15_transparent(x, y, w, h):
+    return layer(coverage(v15_bean(x, y, w, h, transparent=True)), (212, 175, 55))
+
+def draw_legendary_coffee_v5(x, y, w, h):
+    return layer(coverage(v5_coffee(x, y, w, h)), (255, 255, 255), (255, 255, 255, 0))
+
+SDF_DRAWS = {
+    'draw_v15_solid': draw_v15_solid,
+    'draw_v15_transparent': draw_v15_transparent,
+    'draw_legendary_coffee_v5': draw_legendary_coffee_v5,
+}
+
+def sample_centre(asset):
+    # Mean position of the asset's supersampling grid inside a pixel, so the
+    # single SDF sample sits where the supersampled render is centred
+    if not asset.get('sampling'):
+        return 0.0
+    ss, offset, _ = SAMPLING[asset['sampling']]
+    return (ss - 1 + 2 * offset) / (2 * ss)
+
+def render_sdf(asset, size=None):
+    size = size or asset['size']
+    centre = sample_centre(asset)
+    x, y = coordinate_grid(size, size, centre, centre)
+    return SDF_DRAWS[asset['draw'].split(':')[1]](x, y, size, size)
+
+def with_alpha(draw):
+    # Opaque RGB design -> RGBA, so supersample_array can average it
+    def draw_rgba(x, y, w, h):
+        rgb = draw(x, y, w, h)
+        return np.concatenate([rgb, np.full(rgb.shape[:2] + (1,), 255, dtype=np.uint8)], axis=-1)
+    return draw_rgba
+
+def reference(asset, size, ss):
+    # The branch-chain design supersampled ss x ss around the same point as
+    # the SDF sample, as the closest thing to exact coverage
+    draw = vectorize(load_draw(asset['draw']))
+    offset = sample_centre(asset) * ss - (ss - 1) / 2
+    if asset.get('sampling'):
+        return supersample_array(size, size, draw, (ss, offset, SAMPLING[asset['sampling']][2]))
+    if asset['color_type'] == 2:
+        return supersample_array(size, size, with_alpha(draw), (ss, offset, (0, 0, 0, 0)))[..., :3]
+    return supersample_array(size, size, draw, (ss, offset, (0, 0, 0, 0)))
+
+def premultiplied(pixels):
+    # Color weighted by alpha, so the color of (nearly) transparent pixels does not count
+    pixels = pixels.astype(np.float64)
+    if pixels.shape[2] == 4:
+        pixels[..., :3] *= pixels[..., 3:] / 255
+    return pixels
+
+def main():
+    parser = argparse.ArgumentParser(description="Render assets from signed-distance shapes (one sample per pixel)")
+    parser.add_argument('assets', nargs='*', help="asset file names (default: every asset with an SDF design)")
+    parser.add_argument('--size', type=int, help="override canvas size")
+    parser.add_argument('--out', help="write PNGs to this directory")
+    parser.add_argument('--compare', type=int, metavar='SS',
+                        help="report the error against an SS x SS supersampled render of the branch-chain design")
+    args = parser.parse_args()
+
+    for asset in load_manifest():
+        name = os.path.basename(asset['output'])
+        if asset['draw'].split(':')[1] not in SDF_DRAWS or (args.assets and name not in args.assets):
+            continue
+        size = args.size or asset['size']
+        start = time.perf_counter()
+        pixels = render_sdf(asset, size)
+        line = f"{name} @ {size}px: {time.perf_counter() - start:.2f}s"
+        if args.compare:
+            diff = np.abs(premultiplied(pixels) - premultiplied(reference(asset, size, args.compare)))
+            line += f", max error {diff.max():.0f}, mean error {diff.mean():.3f}"
+        print(line)
+        if args.out:
+            os.makedirs(args.out, exist_ok=True)
+            path = os.path.join(args.out, name)
+            with open(path, 'wb') as f:
+                f.write(encode_array(pixels, asset.get('level', -1)))
+            print(f"Created {path}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,298 @@
+import ast
+import builtins
+import copy
+import inspect
+import math
+import textwrap
+import types
+import weakref
+
+# Separable precomputation for the scalar sampling loops. Most of a draw
+# function's arithmetic depends on y alone (ny, steam_y, the steam sine, the
+# nib width_at_y) or on x alone (nx, abs(nx), nx*nx, ...). separate() splits a
+# draw_*(x, y, w, h) function into
+#
+#   rows(y, w, h)              -> tuple of the terms that only depend on y
+#   columns(x, w, h)           -> tuple of the terms that only depend on x
+#   combine(x, y, w, h, r, c)  -> the color, with those terms read from r / c
+#
+# Every hoisted term is the original expression, evaluated on the same
+# operands, so combine() returns exactly what the draw function returns.
+# SampleGrid evaluates columns() once per sub-sample column of the image and
+# rows() once per sub-sample row, so a sample only combines cached terms.
+#
+# A draw function can also declare its own split, or turn it off:
+#   draw_func.separable = (rows, columns, combine)
+#   draw_func.separable = False
+#
+# Only plain functions of local single assignments, if/return chains and
+# arithmetic on numbers (math.*, abs, min, max, ...) are split; for anything
+# else separate() returns None and the draw function is called per sample.
+
+PURE_BUILTINS = {'abs', 'min', 'max', 'float', 'int', 'round'}
+BOTH = frozenset('xy')
+NONE = frozenset()
+
+class NotSeparable(Exception):
+    pass
+
+class Analysis:
+    def __init__(self, func, func_def):
+        self.globals = func.__globals__
+        params = [a.arg for a in func_def.args.args]
+        if len(params) < 2 or func_def.args.vararg or func_def.args.kwarg or func_def.args.kwonlyargs:
+            raise NotSeparable("expected draw(x, y, ...)")
+        self.params = params
+        self.deps = {params[0]: frozenset('x'), params[1]: frozenset('y')}
+        self.deps.update((p, NONE) for p in params[2:])
+        self.counts = {}
+        self.top_level = set()
+        self.count_assignments(func_def.body, True)
+        # Names assigned once, unconditionally: their value has one definition
+        self.single = {name for name, n in self.counts.items() if n == 1 and name in self.top_level}
+        for stmt in func_def.body:
+            for name, value in self.assignments(stmt):
+                if name in self.single:
+                    self.deps[name] = self.expr_deps(value)
+
+    def assignments(self, stmt):
+        # -> [(name, value)] of a top-level assignment statement
+        if isinstance(stmt, ast.Assign) and len(stmt.targets) == 1:
+            target = stmt.targets[0]
+            if isinstance(target, ast.Name):
+                return [(target.id, stmt.value)]
+            if (isinstance(target, ast.Tuple) and isinstance(stmt.value, ast.Tuple)
+                    and len(target.elts) == len(stmt.value.elts) and all(isinstance(t, ast.Name) for t in target.elts)):
+                names = {t.id for t in target.elts}
+                values = stmt.value.elts
+                # Splitting is only safe when no value reads a name of the same statement
+                if not any(isinstance(n, ast.Name) and n.id in names for v in values for n in ast.walk(v)):
+                    return [(t.id, v) for t, v in zip(target.elts, values)]
+        return []
+
+    def count_assignments(self, statements, top):
+        for stmt in statements:
+            if isinstance(stmt, ast.Assign):
+                for target in stmt.targets:
+                    names = [target] if isinstance(target, ast.Name) else getattr(target, 'elts', None)
+                    if names is None or not all(isinstance(n, ast.Name) for n in names):
+                        raise NotSeparable(f"line {stmt.lineno}: unsupported assignment target")
+                    for n in names:
+                        self.counts[n.id] = self.counts.get(n.id, 0) + 1
+                        if top and self.assignments(stmt):
+                            self.top_level.add(n.id)
+            elif isinstance(stmt, ast.AugAssign) and isinstance(stmt.target, ast.Name):
+                self.counts[stmt.target.id] = self.counts.get(stmt.target.id, 0) + 1
+            elif isinstance(stmt, ast.If):
+                self.count_assignments(stmt.body, False)
+                self.count_assignments(stmt.orelse, False)
+            elif isinstance(stmt, ast.Return) or (isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Constant)):
+                pass
+            elif not isinstance(stmt, ast.Pass):
+                raise NotSeparable(f"line {stmt.lineno}: unsupported {type(stmt).__name__} statement")
+
+    def is_math(self, node):
+        return isinstance(node, ast.Name) and node.id not in self.counts and self.globals.get(node.id) is math
+
+    def expr_deps(self, node):
+        if isinstance(node, ast.Constant):
+            return NONE
+        if isinstance(node, ast.Name):
+            if node.id in self.single or (node.id in self.params and node.id not in self.counts):
+                return self.deps[node.id]
+            if node.id in self.counts:
+                return BOTH   # reassigned or conditionally assigned local
+            value = self.globals.get(node.id, getattr(builtins, node.id, None))
+            if isinstance(value, (int, float, tuple)) or value is math:
+                return NONE
+            raise NotSeparable(f"line {node.lineno}: global '{node.id}' is not a number")
+        if isinstance(node, ast.Attribute):
+            if self.is_math(node.value):
+                return NONE
+            raise NotSeparable(f"line {node.lineno}: unsupported attribute")
+        if isinstance(node, ast.Call):
+            func = node.func
+            pure = (isinstance(func, ast.Attribute) and self.is_math(func.value)) or (
+                isinstance(func, ast.Name) and func.id in PURE_BUILTINS and func.id not in self.counts
+                and func.id not in self.globals)
+            if not pure or node.keywords:
+                raise NotSeparable(f"line {node.lineno}: call to {ast.unparse(func)}")
+            return frozenset().union(*(self.expr_deps(a) for a in node.args))
+        if isinstance(node, (ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare, ast.IfExp, ast.Tuple)):
+            return frozenset().union(*(self.expr_deps(c) for c in ast.iter_child_nodes(node)
+                                       if isinstance(c, ast.expr)))
+        raise NotSeparable(f"line {node.lineno}: unsupported expression {type(node).__name__}")
+
+    def trivial(self, node):
+        # Not worth a term: constants, parameters and globals
+        return isinstance(node, ast.Constant) or (isinstance(node, ast.Name) and node.id not in self.single)
+
+class Hoist(ast.NodeTransformer):
+    # Replaces maximal x-only / y-only / constant subexpressions by r[i] / c[j]
+    def __init__(self, analysis):
+        self.analysis = analysis
+        self.rows, self.columns = [], []
+
+    def term(self, node, terms, name):
+        source = ast.unparse(node)
+        keys = [ast.unparse(t) for t in terms]
+        if source in keys:
+            index = keys.index(source)
+        else:
+            index = len(terms)
+            terms.append(node)
+        return ast.Subscript(ast.Name(name, ast.Load()), ast.Constant(index), ast.Load())
+
+    def visit(self, node):
+        if isinstance(node, ast.expr) and not self.analysis.trivial(node):
+            deps = self.analysis.expr_deps(node)
+            if deps != BOTH:
+                if deps == frozenset('x'):
+                    return self.term(node, self.columns, '_c')
+                return self.term(node, self.rows, '_r')
+        return super().visit(node)
+
+def function_def(func):
+    if not isinstance(func, types.FunctionType) or func.__code__.co_freevars:
+        raise NotSeparable("not a plain function")
+    try:
+        source = inspect.getsource(func)
+    except (OSError, TypeError):
+        raise NotSeparable("source code not available")
+    func_def = ast.parse(textwrap.dedent(source)).body[0]
+    if not isinstance(func_def, ast.FunctionDef):
+        raise NotSeparable("not a function definition")
+    func_def.decorator_list = []
+    return func_def
+
+def split(func):
+    # -> source of the rows / columns / combine functions
+    func_def = function_def(func)
+    analysis = Analysis(func, func_def)
+    x, y, *rest = analysis.params
+    hoist = Hoist(analysis)
+    body = []
+    for stmt in func_def.body:
+        parts = analysis.assignments(stmt)
+        if parts and all(name in analysis.single for name, _ in parts):
+            # Definitions of hoisted names move into rows() / columns()
+            kept = [(name, value) for name, value in parts if analysis.deps[name] == BOTH]
+            for name, value in kept:
+                body.append(ast.Assign([ast.Name(name, ast.Store())], hoist.visit(copy.deepcopy(value))))
+            continue
+        body.append(hoist.visit(copy.deepcopy(stmt)))
+    if not hoist.rows and not hoist.columns:
+        raise NotSeparable("nothing to precompute")
+
+    def definitions(allowed):
+        lines = []
+        for stmt in func_def.body:
+            for name, value in analysis.assignments(stmt):
+                if name in analysis.single and analysis.deps[name] <= allowed:
+                    lines.append(f"    {name} = {ast.unparse(value)}")
+        return lines
+
+    def terms(nodes):
+        return f"    return ({''.join(ast.unparse(n) + ', ' for n in nodes)})"
+
+    combine = ast.FunctionDef('combine', ast.arguments([], [ast.arg(a) for a in analysis.params + ['_r', '_c']],
+                                                       None, [], [], None, []), body, [])
+    return '\n'.join([
+        f"def rows({', '.join([y] + rest)}):", *definitions(frozenset('y')), terms(hoist.rows), '',
+        f"def columns({', '.join([x] + rest)}):", *definitions(frozenset('x')), terms(hoist.columns), '',
+        ast.unparse(ast.fix_missing_locations(ast.Module([combine], []))),
+    ]) + '\n'
+
+# draw function -> its split (or None); weak, so reloaded draw functions and
+# wrap_draw's wrappers are not kept alive by the cache
+SPLITS = weakref.WeakKeyDictionary()
+
+def separate(draw_func):
+    # -> (rows, columns, combine), or None when draw_func cannot be split
+    try:
+        return SPLITS[draw_func]
+    except (KeyError, TypeError):
+        pass
+    parts = split_parts(draw_func)
+    try:
+        SPLITS[draw_func] = parts
+    except TypeError:
+        pass   # not weakly referenceable: split again next time
+    return parts
+
+def split_parts(draw_func):
+    declared = getattr(draw_func, 'separable', None)
+    if declared is False:
+        return None
+    if declared is not None:
+        return declared
+    try:
+        source = split(draw_func)
+    except NotSeparable:
+        return None
+    scratch = {}
+    exec(compile(source, f"<separated {draw_func.__module__}.{draw_func.__name__}>", 'exec'), scratch)
+    # Rebind to the draw function's module so globals (math, constants) resolve the same way
+    return tuple(types.FunctionType(scratch[name].__code__, draw_func.__globals__, name)
+                 for name in ('rows', 'columns', 'combine'))
+
+def wrap_draw(draw_func, wrap, split=True):
+    # Instrumented stand-in for draw_func (bench_assets.py, profile_render.py)
+    # that renders the way draw_func does: it keeps the culling declarations
+    # and, with split, draw_func's split with every part wrapped.
+    # wrap(func, sample) -> wrapped func; sample is True for the functions
+    # that evaluate one sample (draw_func itself and combine)
+    wrapper = wrap(draw_func, True)
+    for name in ('bounds', 'background'):
+        if hasattr(draw_func, name):
+            setattr(wrapper, name, getattr(draw_func, name))
+    parts = separate(draw_func) if split else None
+    if parts is None:
+        wrapper.separable = False
+    else:
+        rows, columns, combine = parts
+        wrapper.separable = (wrap(rows, False), wrap(columns, False), wrap(combine, True))
+    return wrapper
+
+class SampleGrid:
+    # Samples of draw_func at (x + ox, y + oy) for every pair of sub-pixel
+    # offsets, sub-rows outer and sub-columns inner (the order of the
+    # supersampling loops)
+    def __init__(self, draw_func, width, height, offsets, separate_terms=True):
+        self.draw_func = draw_func
+        self.width, self.height = width, height
+        self.offsets = list(offsets)
+        self.parts = separate(draw_func) if separate_terms else None
+        self.y = None
+        self.row_terms = None
+        self.column_terms = {}
+
+    def terms(self, function, value):
+        # A term that raises (e.g. math.sqrt of a negative number in a branch
+        # the draw function never takes there) sends that row / column back
+        # to plain draw calls
+        try:
+            return function(value, self.width, self.height)
+        except (ArithmeticError, ValueError):
+            return None
+
+    def samples(self, x, y):
+        draw_func, width, height, offsets = self.draw_func, self.width, self.height, self.offsets
+        if self.parts is None:
+            return [draw_func(x + ox, y + oy, width, height) for oy in offsets for ox in offsets]
+        rows, columns, combine = self.parts
+        if y != self.y:
+            self.y = y
+            self.row_terms = [self.terms(rows, y + oy) for oy in offsets]
+        column_terms = self.column_terms.get(x)
+        if column_terms is None:
+            column_terms = self.column_terms[x] = [self.terms(columns, x + ox) for ox in offsets]
+        out = []
+        for oy, r in zip(offsets, self.row_terms):
+            py = y + oy
+            for ox, c in zip(offsets, column_terms):
+                if r is None or c is None:
+                    out.append(draw_func(x + ox, py, width, height))
+                else:
+                    out.append(combine(x + ox, py, width, height, r, c))
+        return out
@@ -0,0 +1,131 @@
+import argparse
+import math
+import os
+import time
+
+import numpy as np
+
+from build_assets import ROOT, asset_hash, load_manifest
+from culling import pixel_boxes
+from parallel_render import load_draw
+from png_encoder import encode_apng
+from supersample import SAMPLING
+from vector_render import encode_array, render_array, supersample_array
+from vectorize import vectorize
+
+# Animated steam for the splash designs. The draw functions take a
+# steam_phase local (0 in the shipped assets) that shifts the steam sine and
+# the nib riding on it; everything else is static. So the whole design is
+# rendered once, at phase 0, and cached on disk under build/steam_cache; each
+# further frame re-renders only the steam box the draw function declares in
+# its bounds (see culling.py), and only the part of it that changed since the
+# previous frame goes into the APNG (fcTL offsets + fdAT).
+#
+#   python steam_animation.py splash_v5_pro_transparent.png --frames 24 --fps 12
+#   python steam_animation.py splash_v4_final_premium.png --strip
+
+# draw spec -> index of the steam box in the draw function's declared bounds
+ANIMATED = {
+    'create_hq_splash:draw_premium_cup_v4': 1,
+    'create_v5_splash:draw_legendary_coffee_v5': 1,
+}
+CACHE_DIR = os.path.join(ROOT, 'build', 'steam_cache')
+
+def render_region(draw, size, box, sampling):
+    # Pixels [x0, x1) x [y0, y1) of a size x size render
+    x0, y0, x1, y1 = box
+
+    def shifted(x, y, w, h):
+        return draw(x + x0, y + y0, size, size)
+    if sampling:
+        return supersample_array(x1 - x0, y1 - y0, shifted, SAMPLING[sampling])
+    return render_array(x1 - x0, y1 - y0, shifted)
+
+def static_layer(asset, size):
+    # Full render at phase 0, cached by the draw function's source and the asset settings
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    name = os.path.splitext(os.path.basename(asset['output']))[0]
+    path = os.path.join(CACHE_DIR, f"{name}-{size}-{asset_hash(asset)[:16]}.npy")
+    if os.path.exists(path):
+        return np.load(path), True
+    pixels = render_region(vectorize(load_draw(asset['draw'])), size, (0, 0, size, size), asset.get('sampling'))
+    np.save(path, pixels)
+    return pixels, False
+
+def changed_box(before, after):
+    # Bounding box (x0, y0, x1, y1) of the differing pixels, or None
+    changed = np.any(before != after, axis=-1)
+    rows, cols = np.flatnonzero(changed.any(axis=1)), np.flatnonzero(changed.any(axis=0))
+    if not len(rows):
+        return None
+    return int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1
+
+def animate(asset, size, frame_count):
+    # -> (full frames, APNG frame list, timings)
+    draw_func = load_draw(asset['draw'])
+    band = pixel_boxes(draw_func, size, size)[ANIMATED[asset['draw']]]
+    bx0, by0, bx1, by1 = band
+    start = time.perf_counter()
+    static, cached = static_layer(asset, size)
+    static_time = time.perf_counter() - start
+
+    full = [static]
+    deltas = [(0, 0, size, size, static)]
+    previous = static[by0:by1, bx0:bx1]
+    start = time.perf_counter()
+    for k in range(1, frame_count):
+        phase = 2 * math.pi * k / frame_count
+        draw = vectorize(draw_func, {'steam_phase': phase})
+        region = render_region(draw, size, band, asset.get('sampling'))
+        frame = static.copy()
+        frame[by0:by1, bx0:bx1] = region
+        full.append(frame)
+        # An unchanged frame still needs a region; one pixel is the smallest
+        box = changed_box(previous, region) or (0, 0, 1, 1)
+        x0, y0, x1, y1 = box
+        deltas.append((bx0 + x0, by0 + y0, x1 - x0, y1 - y0, region[y0:y1, x0:x1]))
+        previous = region
+    band_time = time.perf_counter() - start
+    return full, deltas, {'static': static_time, 'cached': cached, 'frames': band_time, 'band': band}
+
+def main():
+    parser = argparse.ArgumentParser(description="Render an animated steam splash (APNG with delta frames, or a strip)")
+    parser.add_argument('asset', help="asset file name, e.g. splash_v5_pro_transparent.png")
+    parser.add_argument('--size', type=int, help="override canvas size")
+    parser.add_argument('--frames', type=int, default=24, help="frames per steam cycle")
+    parser.add_argument('--fps', type=float, default=12)
+    parser.add_argument('--strip', action='store_true', help="write the full frames stacked vertically instead")
+    parser.add_argument('--level', type=int, default=9)
+    parser.add_argument('--out', help="output file (default: build/<asset>_steam.png)")
+    args = parser.parse_args()
+
+    assets = {os.path.basename(a['output']): a for a in load_manifest() if a['draw'] in ANIMATED}
+    if args.asset not in assets:
+        parser.error(f"{args.asset} has no animated steam; choose from {', '.join(sorted(assets))}")
+    asset = assets[args.asset]
+    size = args.size or asset['size']
+    full, deltas, timings = animate(asset, size, args.frames)
+
+    stem = os.path.splitext(args.asset)[0]
+    out = args.out or os.path.join(ROOT, 'build', f"{stem}_steam{'_strip' if args.strip else ''}.png")
+    os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+    start = time.perf_counter()
+    if args.strip:
+        data = encode_array(np.concatenate(full, axis=0), args.level)
+    else:
+        frames = [(x, y, w, h, (row.tobytes() for row in pixels)) for x, y, w, h, pixels in deltas]
+        data = encode_apng(size, size, frames, round(1000 / args.fps), 6, args.level)
+    encode_time = time.perf_counter() - start
+    with open(out, 'wb') as f:
+        f.write(data)
+
+    bx0, by0, bx1, by1 = timings['band']
+    delta_pixels = sum(w * h for _, _, w, h, _ in deltas[1:])
+    print(f"static layer {'loaded from cache' if timings['cached'] else 'rendered'} in {timings['static']:.2f}s; "
+          f"{args.frames - 1} steam frames ({bx1 - bx0}x{by1 - by0} band) in {timings['frames']:.2f}s")
+    print(f"delta frames cover {delta_pixels / max(1, (args.frames - 1) * size * size):.1%} of the canvas; "
+          f"encoded in {encode_time:.2f}s")
+    print(f"Created {out} ({len(data):,} bytes)")
+
+if __name__ == '__main__':
+    main()
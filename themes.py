@@ -0,0 +1,163 @@
+import argparse
+import os
+import re
+import time
+
+import numpy as np
+
+from build_assets import ROOT, load_manifest
+from parallel_render import load_draw
+from vector_render import encode_array, render_array, render_asset_array
+from vectorize import vectorize
+
+# Render once, colorize many. A design is rendered a single time and reduced
+# to a coverage mask (how much of each pixel the shape covers) plus its
+# foreground color; every themed variant is then a per-pixel blend over that
+# mask, so adding a variant costs one color mapping instead of a re-render.
+#
+# A theme is (foreground, background), each an RGB tuple or None:
+#   foreground None  keep the design's own color
+#   background None  transparent (alpha = coverage)
+#
+# Fully transparent pixels keep the RGB the renderer wrote there ((255, 255,
+# 255, 0) for v5), so the transparent variant in the design's own color
+# matches the render pixel for pixel (checked for every RGBA manifest asset).
+#
+# The light/dark backgrounds are flutter_native_splash's color / color_dark
+# from pubspec.yaml.
+
+PUBSPEC_PATH = os.path.join(ROOT, 'pubspec.yaml')
+
+def hex_color(value):
+    value = value.lstrip('#')
+    if not re.fullmatch(r'[0-9A-Fa-f]{6}', value):
+        raise ValueError(f"not a #RRGGBB color: {value}")
+    return tuple(int(value[i:i + 2], 16) for i in (0, 2, 4))
+
+def splash_colors(path=PUBSPEC_PATH):
+    # -> (color, color_dark) of the flutter_native_splash section
+    colors = {'color': '#5D4037', 'color_dark': '#121212'}
+    with open(path) as f:
+        text = f.read()
+    # The top-level config section, not the dependency of the same name
+    match = re.search(r'^flutter_native_splash:', text, re.MULTILINE)
+    section = text[match.end():] if match else ''
+    for key in colors:
+        match = re.search(rf'^\s+{key}:\s*"(#[0-9A-Fa-f]{{6}})"', section, re.MULTILINE)
+        if match:
+            colors[key] = match.group(1)
+    return hex_color(colors['color']), hex_color(colors['color_dark'])
+
+def default_themes():
+    light, dark = splash_colors()
+    return {
+        'light': (None, light),
+        'dark': (None, dark),
+        # Android 13 themed icons only use the alpha of the monochrome layer
+        'monochrome': ((255, 255, 255), None),
+        'adaptive_foreground': (None, None),
+    }
+
+def dominant_color(colors):
+    values, counts = np.unique(colors, axis=0, return_counts=True)
+    return tuple(int(c) for c in values[np.argmax(counts)])
+
+def coverage_mask(pixels):
+    # (H, W, 3|4) render -> (coverage in [0, 1], foreground RGB)
+    if pixels.shape[2] == 4:
+        alpha = pixels[..., 3]
+        covered = pixels[alpha > 0, :3]
+        return alpha / 255, dominant_color(covered) if len(covered) else (255, 255, 255)
+    # Opaque two-tone design: the corner pixel is the background and the most
+    # common other color the foreground; blended pixels are projected onto the
+    # line between the two
+    bg = pixels[0, 0]
+    covered = pixels[np.any(pixels != bg, axis=-1)]
+    if len(covered) == 0:
+        return np.zeros(pixels.shape[:2]), (255, 255, 255)
+    fg = dominant_color(covered)
+    step = np.subtract(fg, bg, dtype=np.float64)
+    coverage = np.clip((pixels - bg.astype(np.float64)) @ step / (step @ step), 0.0, 1.0)
+    return coverage, fg
+
+def transparent_rgb(pixels):
+    # RGB the renderer writes into fully transparent pixels, e.g. (255, 255, 255) for v5
+    if pixels.shape[2] == 4:
+        empty = pixels[pixels[..., 3] == 0, :3]
+        if len(empty):
+            return dominant_color(empty)
+    return (0, 0, 0)
+
+def colorize(coverage, fg, bg, empty=(0, 0, 0)):
+    # Coverage mask -> (H, W, 3) opaque on bg, or (H, W, 4) with bg None, where
+    # fully transparent pixels get the RGB `empty`
+    fg = np.asarray(fg, dtype=np.float64)
+    if bg is None:
+        out = np.zeros(coverage.shape + (4,), dtype=np.uint8)
+        out[..., :3] = empty
+        alpha = np.rint(coverage * 255).astype(np.uint8)
+        out[alpha > 0, :3] = fg
+        out[..., 3] = alpha
+        return out
+    bg = np.asarray(bg, dtype=np.float64)
+    return np.rint(bg + (fg - bg) * coverage[..., np.newaxis]).astype(np.uint8)
+
+def render_variants(pixels, themes):
+    # -> {theme name: pixels}
+    coverage, design_fg = coverage_mask(pixels)
+    empty = transparent_rgb(pixels)
+    return {name: colorize(coverage, fg or design_fg, bg, empty) for name, (fg, bg) in themes.items()}
+
+def parse_theme(value):
+    # name=FG[:BG], FG/BG as #RRGGBB, '-' for the design's color (FG) or transparent (BG)
+    name, _, colors = value.partition('=')
+    fg, _, bg = colors.partition(':')
+    if not name or not fg:
+        raise argparse.ArgumentTypeError(f"expected name=FG[:BG], got {value!r}")
+    try:
+        return name, (None if fg == '-' else hex_color(fg), None if bg in ('', '-') else hex_color(bg))
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def main():
+    parser = argparse.ArgumentParser(description="Render each design once and write themed color variants of it")
+    parser.add_argument('assets', nargs='*', help="asset file names (default: all in asset_manifest.json)")
+    parser.add_argument('--draw', action='append', default=[], metavar='MODULE:FUNCTION',
+                        help="also theme a draw function that is not in the manifest, e.g. create_identity_icons:draw_v16")
+    parser.add_argument('--theme', action='append', type=parse_theme, default=[], metavar='NAME=FG[:BG]',
+                        help="add or replace a theme; '-' keeps the design's color (FG) or leaves it transparent (BG)")
+    parser.add_argument('--size', type=int, help="override canvas size")
+    parser.add_argument('--out', default='build/themes', help="output directory")
+    parser.add_argument('--level', type=int, default=9, help="zlib level")
+    args = parser.parse_args()
+
+    themes = default_themes()
+    themes.update(args.theme)
+    jobs = []
+    if args.assets or not args.draw:
+        for asset in load_manifest():
+            name = os.path.basename(asset['output'])
+            if not args.assets or name in args.assets:
+                jobs.append((os.path.splitext(name)[0], lambda a=asset: render_asset_array(a, args.size)))
+    for spec in args.draw:
+        size = args.size or 1024
+        draw = vectorize(load_draw(spec))
+        jobs.append((spec.split(':')[1], lambda d=draw, s=size: render_array(s, s, d)))
+
+    os.makedirs(args.out, exist_ok=True)
+    for stem, render in jobs:
+        start = time.perf_counter()
+        pixels = render()
+        render_time = time.perf_counter() - start
+        start = time.perf_counter()
+        variants = render_variants(pixels, themes)
+        color_time = time.perf_counter() - start
+        for theme, variant in variants.items():
+            path = os.path.join(args.out, f'{stem}_{theme}.png')
+            with open(path, 'wb') as f:
+                f.write(encode_array(variant, args.level))
+        print(f"{stem}: render {render_time:.2f}s, {len(variants)} variants {color_time:.2f}s -> "
+              f"{', '.join(f'{stem}_{theme}.png' for theme in variants)}")
+
+if __name__ == '__main__':
+    main()
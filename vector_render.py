@@ -0,0 +1,380 @@
+import argparse
+import os
+import time
+from functools import lru_cache
+
+import numpy as np
+
+from build_assets import ROOT, is_protected, load_manifest
+from parallel_render import load_draw
+from png_encoder import CHANNELS, FILTER_MODES, STRATEGIES, encode_png, render_rows
+from supersample import SAMPLING, uniform_rows
+
+# Renders the manifest assets with NumPy. Draw functions take coordinate
+# arrays x (1, W) and y (H, 1) and return a (H, W, channels) uint8 buffer.
+# The if/return chains become ordered (mask, color) lists where the first
+# matching mask wins, exactly as the first matching `return` wins in the
+# scalar version.
+#
+# By default the scalar draw_* functions are compiled by vectorize.py, so an
+# edit to a generator script is rendered as is. The hand-written functions
+# below (VECTOR_DRAWS, --hand) are the originals vectorize.py was checked
+# against; they are not updated with the generators, so --hand refuses to
+# write an asset whose hand-written version differs from the scalar render.
+
+def select(shape, choices, default):
+    out = np.empty(shape + (len(default),), dtype=np.uint8)
+    out[...] = default
+    # Paint in reverse so earlier masks override later ones
+    for mask, color in reversed(choices):
+        out[np.broadcast_to(mask, shape)] = color
+    return out
+
+def grid_shape(x, y):
+    return (y.shape[0], x.shape[1])
+
+# apply_v15.py / create_identity_icons.py
+def draw_v15_solid(x, y, w, h):
+    bg, fg = (43, 27, 23), (212, 175, 55)
+    cx, cy = w/2, h/2
+    dx, dy = (x - cx)/0.8, (y - cy)/1.2
+
+    bean = dx*dx + dy*dy < 280**2
+    slit = (np.abs(dx) < 12) & (dy < 100)
+    hole = dx*dx + (dy-120)**2 < 30**2
+    return select(grid_shape(x, y), [
+        (bean & slit, bg),
+        (bean & hole, bg),
+        (bean, fg),
+    ], bg)
+
+draw_v15 = draw_v15_solid
+
+def draw_v15_transparent(x, y, w, h):
+    fg, trans = (212, 175, 55, 255), (0, 0, 0, 0)
+    cx, cy = w/2, h/2
+    dx, dy = (x - cx)/0.6, (y - cy)/0.8
+
+    bean = dx*dx + dy*dy < 250**2
+    slit = (np.abs(dx) < 15) & (dy < 80)
+    hole = dx*dx + (dy-100)**2 < 25**2
+    return select(grid_shape(x, y), [
+        (bean & slit, trans),
+        (bean & hole, trans),
+        (bean, fg),
+    ], trans)
+
+def draw_v16(x, y, w, h):
+    bg, fg = (26, 26, 26), (245, 245, 220)
+    cx, cy = w/2, h/2
+    dx, dy = x - cx, y - cy
+    dist = np.sqrt(dx*dx + dy*dy)
+
+    ring = (240 < dist) & (dist < 260)
+    handle_box = (240 < dx) & (dx < 320) & (-60 < dy) & (dy < 60)
+    handle_d = (dx-250)**2 + dy*dy
+    handle = handle_box & (handle_d < 70**2) & (handle_d > 40**2)
+    log_lines = (dist < 200) & (np.abs(dy) % 60 < 10) & (-120 < dx) & (dx < 120)
+    return select(grid_shape(x, y), [
+        (ring, fg),
+        (handle, fg),
+        (log_lines, fg),
+    ], bg)
+
+def draw_v17(x, y, w, h):
+    bg, fg = (160, 82, 45), (255, 255, 255)
+    box = (250 < x) & (x < 774) & (250 < y) & (y < 774)
+    cx, cy = 512, 512
+    dx, dy = (x - cx)/0.5, (y - cy)/0.7
+    bean = box & (dx*dx + dy*dy < 150**2)
+    slit = np.abs(dx - 30*np.sin(dy/50)) < 10
+    inner = (270 < x) & (x < 754) & (270 < y) & (y < 754)
+    return select(grid_shape(x, y), [
+        (bean & slit, bg),
+        (bean, fg),
+        (box & ~inner, fg),
+    ], bg)
+
+# create_splash_logo.py
+def draw_cup_pen_splash(x, y, w, h):
+    cx, cy = w/2, h/2
+    dx, dy = x - cx, y - cy
+    scale = 0.5
+    nx, ny = dx / (w * scale / 2), dy / (h * scale / 2)
+    white, trans = (255, 255, 255, 255), (0, 0, 0, 0)
+
+    cup = (nx*nx + (ny/0.8)**2 < 0.6) & (ny > -0.1)
+    hdx, hdy = nx - 0.7, ny - 0.2
+    hd = hdx*hdx + hdy*hdy
+    handle = (0.05 < hd) & (hd < 0.15) & (hdx > 0)
+    pdx, pdy = nx, ny + 0.6
+    nib_box = (np.abs(pdx) < 0.15) & (-0.4 < pdy) & (pdy < 0.2)
+    width_at_y = 0.15 * (1 - (pdy + 0.4) / 0.6)
+    nib = nib_box & (np.abs(pdx) < width_at_y)
+    slit = (np.abs(pdx) < 0.01) & (pdy < 0)
+    return select(grid_shape(x, y), [
+        (cup, white),
+        (handle, white),
+        (nib & slit, trans),
+        (nib, white),
+    ], trans)
+
+# create_final_splash.py
+def draw_option1_refined(x, y, w, h):
+    cx, cy = w/2, h/2 * 1.1
+    dx, dy = x - cx, y - cy
+    scale = 0.55
+    nx, ny = dx / (w * scale / 2), dy / (h * scale / 2)
+    white, trans = (255, 255, 255, 255), (0, 0, 0, 0)
+
+    dist_bowl = nx*nx + (ny/0.7)**2
+    bowl = (0.5 < dist_bowl) & (dist_bowl < 0.65) & (ny > -0.1)
+    bottom = (ny > 0.4) & (np.abs(nx) < 0.45) & (ny < 0.5)
+    hdx, hdy = nx - 0.72, ny - 0.15
+    hd = hdx*hdx + hdy*hdy
+    handle = (0.08 < hd) & (hd < 0.16) & (hdx > 0)
+    sdx = nx - 0.15 * np.sin((ny + 0.5) * 4)
+    steam = (-0.9 < ny) & (ny < -0.1) & (np.abs(sdx) < 0.04)
+    ndx, ndy = nx - 0.15 * np.sin((-0.9 + 0.5) * 4), ny + 0.95
+    nib_box = (np.abs(ndx) < 0.2) & (-0.1 < ndy) & (ndy < 0.3)
+    width_at_y = 0.18 * (1 - (ndy + 0.1) / 0.45)
+    nib = nib_box & (np.abs(ndx) < width_at_y)
+    slit = (np.abs(ndx) < 0.01) & (ndy < 0.1)
+    hole = ndx*ndx + (ndy-0.12)**2 < 0.001
+    return select(grid_shape(x, y), [
+        (bowl, white),
+        (bottom, white),
+        (handle, white),
+        (steam, white),
+        (nib & slit, trans),
+        (nib & hole, trans),
+        (nib, white),
+    ], trans)
+
+# create_white_bean.py
+def draw_white_bean_transparent(x, y, w, h):
+    cx, cy = w/2, h/2
+    dx, dy = (x - cx), (y - cy)
+    scale = 0.45
+    nx, ny = dx / (w * scale / 2), dy / (h * scale / 2)
+
+    bean = nx*nx + (ny/1.5)**2 < 1.0
+    slit = np.abs(nx - 0.15 * np.sin(ny * 3)) < 0.08
+    return select(grid_shape(x, y), [
+        (bean & slit, (0, 0, 0, 0)),
+        (bean, (255, 255, 255, 255)),
+    ], (0, 0, 0, 0))
+
+# create_hq_splash.py
+def draw_premium_cup_v4(x, y, w, h):
+    cx, cy = w/2, h/2 * 1.12
+    dx, dy = x - cx, y - cy
+    scale = 0.52
+    nx, ny = dx / (w * scale / 2), dy / (h * scale / 2)
+    white, trans = (255, 255, 255, 255), (0, 0, 0, 0)
+
+    dist_bowl = nx*nx + (ny/0.75)**2
+    bowl = (0.58 < dist_bowl) & (dist_bowl < 0.65) & (ny > -0.15)
+    bottom = (ny > 0.4) & (np.abs(nx) < 0.45) & (ny < 0.48)
+    hdx, hdy = nx - 0.75, ny - 0.1
+    hd = (hdx/1.2)**2 + hdy*hdy
+    handle = (0.08 < hd) & (hd < 0.15) & (hdx > 0)
+    sdx, sdy = nx, ny - 0.55
+    sd = (sdx/1.2)**2 + (sdy/0.2)**2
+    saucer = (0.4 < sd) & (sd < 0.5) & (sdy > 0)
+    steam_y = ny + 0.55
+    off_x = 0.15 * np.sin(steam_y * 5)
+    steam = (-0.8 < steam_y) & (steam_y < 0) & (np.abs(nx - off_x) < 0.03)
+    pdx, pdy = nx - 0.15 * np.sin(-0.8 * 5), ny + 0.95
+    nib_box = (np.abs(pdx) < 0.2) & (-0.15 < pdy) & (pdy < 0.35)
+    width_at_y = 0.2 * (1 - (pdy + 0.15) / 0.5)
+    nib = nib_box & (np.abs(pdx) < width_at_y)
+    slit = (np.abs(pdx) < 0.012) & (pdy < 0.12)
+    eyelet = pdx*pdx + (pdy-0.15)**2 < 0.0012
+    return select(grid_shape(x, y), [
+        (bowl, white),
+        (bottom, white),
+        (handle, white),
+        (saucer, white),
+        (steam, white),
+        (nib & slit, trans),
+        (nib & eyelet, trans),
+        (nib, white),
+    ], trans)
+
+# create_v5_splash.py
+def draw_legendary_coffee_v5(x, y, w, h):
+    cx, cy = w/2, h/2 * 1.08
+    dx, dy = x - cx, y - cy
+    s = 0.55
+    nx, ny = dx / (w * s / 2), dy / (h * s / 2)
+    white, trans = (255, 255, 255, 255), (0, 0, 0, 0)
+
+    body_box = (ny > -0.1) & (ny < 0.4) & (np.abs(nx) < 0.7 - (ny * 0.2))
+    round_bottom = nx*nx + (ny-0.1)**2 < 0.3
+    body = body_box & ((ny <= 0.3) | round_bottom)
+    bowl_dist = nx*nx + (ny/0.8)**2
+    bowl = (bowl_dist < 0.45) & (ny < 0.4) & (ny > -0.1)
+    hdx, hdy = nx - 0.65, ny - 0.15
+    hd = hdx*hdx + hdy*hdy
+    handle = (0.04 < hd) & (hd < 0.12) & (hdx > 0)
+    sdx, sdy = nx, ny - 0.55
+    saucer = ((sdx/1.1)**2 + (sdy/0.2)**2 < 0.4) & (0 < sdy) & (sdy < 0.1)
+    steam_y = ny + 0.5
+    off_x = 0.12 * np.sin(steam_y * 4.5)
+    steam = (-0.9 < steam_y) & (steam_y < 0.1) & (np.abs(nx - off_x) < 0.04)
+    pdx, pdy = nx - 0.12 * np.sin(-0.9 * 4.5), ny + 0.95
+    nib_box = (np.abs(pdx) < 0.22) & (-0.15 < pdy) & (pdy < 0.4)
+    w_at_y = 0.22 * (1 - (pdy + 0.1) / 0.5)
+    nib = nib_box & (np.abs(pdx) < w_at_y)
+    slit = (np.abs(pdx) < 0.015) & (pdy < 0.15)
+    hole = pdx*pdx + (pdy-0.2)**2 < 0.0015
+    return select(grid_shape(x, y), [
+        (body, white),
+        (bowl, white),
+        (handle, white),
+        (saucer, white),
+        (steam, white),
+        (nib & slit, trans),
+        (nib & hole, trans),
+        (nib, white),
+    ], trans)
+
+VECTOR_DRAWS = {
+    'draw_v15_solid': draw_v15_solid,
+    'draw_v15': draw_v15,
+    'draw_v15_transparent': draw_v15_transparent,
+    'draw_v16': draw_v16,
+    'draw_v17': draw_v17,
+    'draw_cup_pen_splash': draw_cup_pen_splash,
+    'draw_option1_refined': draw_option1_refined,
+    'draw_white_bean_transparent': draw_white_bean_transparent,
+    'draw_premium_cup_v4': draw_premium_cup_v4,
+    'draw_legendary_coffee_v5': draw_legendary_coffee_v5,
+}
+
+@lru_cache(maxsize=256)
+def coordinate_grid(width, height, offset_x=0.0, offset_y=0.0):
+    # Same float arithmetic as `x + sx/ss` in the scalar loops. Cached and
+    # shared between renders, so the arrays are read-only
+    x = np.arange(width, dtype=np.float64)[np.newaxis, :] + offset_x
+    y = np.arange(height, dtype=np.float64)[:, np.newaxis] + offset_y
+    x.flags.writeable = y.flags.writeable = False
+    return x, y
+
+def render_array(width, height, draw):
+    x, y = coordinate_grid(width, height)
+    return draw(x, y, width, height)
+
+def supersample_array(width, height, draw, sampling):
+    ss, offset, empty = sampling
+    r = np.zeros((height, width))
+    g = np.zeros((height, width))
+    b = np.zeros((height, width))
+    a = np.zeros((height, width), dtype=np.int64)
+    # Accumulate in the scalar loop's order (sy outer, sx inner) so the float
+    # sums round identically
+    for sy in range(ss):
+        for sx in range(ss):
+            x, y = coordinate_grid(width, height, (sx + offset) / ss, (sy + offset) / ss)
+            sample = draw(x, y, width, height)
+            ca = sample[..., 3].astype(np.int64)
+            weight = ca / 255
+            r += sample[..., 0] * weight
+            g += sample[..., 1] * weight
+            b += sample[..., 2] * weight
+            a += ca
+
+    out = np.empty((height, width, 4), dtype=np.uint8)
+    out[...] = empty
+    avg_a = (a / (ss * ss)).astype(np.int64)
+    covered = avg_a > 0
+    norm = a[covered] / 255
+    out[covered, 0] = (r[covered] / norm).astype(np.int64)
+    out[covered, 1] = (g[covered] / norm).astype(np.int64)
+    out[covered, 2] = (b[covered] / norm).astype(np.int64)
+    out[covered, 3] = avg_a[covered]
+    return out
+
+def render_asset_array(asset, size=None, hand=False):
+    # asset: an asset_manifest.json entry; hand=True uses the hand-written
+    # VECTOR_DRAWS instead of vectorize.py's translation of the draw function
+    size = size or asset['size']
+    if hand:
+        draw = VECTOR_DRAWS[asset['draw'].split(':')[1]]
+    else:
+        from vectorize import vectorize
+        draw = vectorize(load_draw(asset['draw']))
+    if asset.get('sampling'):
+        return supersample_array(size, size, draw, SAMPLING[asset['sampling']])
+    return render_array(size, size, draw)
+
+def render_asset_scalar(asset, size=None):
+    size = size or asset['size']
+    draw_func = load_draw(asset['draw'])
+    if asset.get('sampling'):
+        channels = 4
+        rows = uniform_rows(size, size, draw_func, *SAMPLING[asset['sampling']])
+    else:
+        channels = CHANNELS[asset['color_type']]
+        rows = render_rows(size, size, draw_func, channels)
+    return np.frombuffer(b''.join(bytes(row) for row in rows), dtype=np.uint8).reshape(size, size, channels)
+
+def encode_array(pixels, level=-1, filter_mode='none', strategy='default', indexed=False):
+    height, width, channels = pixels.shape
+    color_type = 6 if channels == 4 else 2
+    return encode_png(width, height, (row.tobytes() for row in pixels), color_type, level, filter_mode, strategy,
+                      indexed)
+
+def compare_asset(asset, size=None, hand=False):
+    # Pixel-exact check of the vectorized path against the scalar generator
+    vector = render_asset_array(asset, size, hand)
+    scalar = render_asset_scalar(asset, size)
+    diff = np.any(vector != scalar, axis=-1)
+    return int(diff.sum()), diff.size
+
+def main():
+    parser = argparse.ArgumentParser(description="Render the generated icon/splash assets with NumPy")
+    parser.add_argument('--out', help="output directory (default: each asset's manifest path)")
+    parser.add_argument('--compare', action='store_true', help="check against the scalar path instead of writing files")
+    parser.add_argument('--size', type=int, help="override canvas size (useful with --compare)")
+    parser.add_argument('--level', type=int, help="zlib level (default: the manifest's)")
+    parser.add_argument('--filter', dest='filter_mode', choices=FILTER_MODES, default='none')
+    parser.add_argument('--strategy', choices=sorted(STRATEGIES), default='default')
+    parser.add_argument('--hand', action='store_true',
+                        help="use the hand-written VECTOR_DRAWS instead of compiling the scalar draw functions")
+    parser.add_argument('--force', action='store_true',
+                        help="overwrite files the manifest protects")
+    parser.add_argument('assets', nargs='*', help="asset file names to render (default: all)")
+    args = parser.parse_args()
+
+    selected = [a for a in load_manifest() if not args.assets or os.path.basename(a['output']) in args.assets]
+    for asset in selected:
+        name = os.path.basename(asset['output'])
+        start = time.perf_counter()
+        if args.compare:
+            mismatched, total = compare_asset(asset, args.size, args.hand)
+            status = "OK" if mismatched == 0 else f"{mismatched}/{total} pixels differ"
+            print(f"{name}: {status} ({time.perf_counter() - start:.2f}s)")
+            continue
+        if args.hand:
+            mismatched, total = compare_asset(asset, args.size, hand=True)
+            if mismatched:
+                print(f"{name}: hand-written draw differs from the scalar render in {mismatched}/{total} pixels; "
+                      f"not written (render without --hand)")
+                continue
+        level = asset.get('level', -1) if args.level is None else args.level
+        png = encode_array(render_asset_array(asset, args.size, args.hand), level, args.filter_mode, args.strategy,
+                           asset.get('indexed', False))
+        if not args.out and not args.force and is_protected(asset, png):
+            # Same guard as build_assets.py
+            print(f"{asset['output']}: protected in the manifest and differs from the render; "
+                  f"kept (use --force or --out)")
+            continue
+        path = os.path.join(args.out, name) if args.out else os.path.join(ROOT, asset['output'])
+        with open(path, 'wb') as f:
+            f.write(png)
+        print(f"Created {path} ({time.perf_counter() - start:.2f}s)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,317 @@
+import argparse
+import ast
+import inspect
+import math
+import textwrap
+import time
+
+import numpy as np
+
+from parallel_render import load_draw
+from png_encoder import render_rows
+
+# Compiles a scalar draw_*(x, y, w, h) function into a NumPy one that takes
+# coordinate arrays, the same contract as the hand-written functions in
+# vector_render.py. Assignments become array expressions, every `if` becomes
+# a path mask, and every `return <color>` becomes a (mask, color) entry; the
+# entries are resolved in source order by vector_render.select, so the first
+# return a pixel reaches wins, as in the scalar function. Names assigned on
+# only some paths are merged with np.where.
+#
+# Translated: arithmetic, comparisons (chained too), and/or/not, conditional
+# expressions, abs/min/max, math.* functions and constants, module-level
+# number and color constants, tuple assignment. Colors must be constant tuples
+# (or names bound to one at the top level). Anything else (loops, calls to
+# other functions, computed colors, ...) raises Unsupported, and vectorize()
+# falls back to calling the scalar function once per pixel.
+
+class Unsupported(Exception):
+    pass
+
+MATH_FUNCTIONS = {
+    'sin': 'sin', 'cos': 'cos', 'tan': 'tan', 'asin': 'arcsin', 'acos': 'arccos', 'atan': 'arctan',
+    'atan2': 'arctan2', 'sqrt': 'sqrt', 'hypot': 'hypot', 'exp': 'exp', 'log': 'log', 'fabs': 'abs',
+    'floor': 'floor', 'ceil': 'ceil',
+}
+MATH_CONSTANTS = {'pi': math.pi, 'e': math.e, 'tau': math.tau}
+BINARY_OPS = {ast.Add: '+', ast.Sub: '-', ast.Mult: '*', ast.Div: '/', ast.Pow: '**', ast.Mod: '%', ast.FloorDiv: '//'}
+COMPARE_OPS = {ast.Lt: '<', ast.LtE: '<=', ast.Gt: '>', ast.GtE: '>=', ast.Eq: '==', ast.NotEq: '!='}
+
+def is_color(value):
+    return isinstance(value, tuple) and all(isinstance(v, (int, float)) for v in value)
+
+class Compiler:
+    def __init__(self, func, overrides=None):
+        self.func = func
+        self.globals = func.__globals__
+        self.overrides = dict(overrides or {})   # local name -> number, replaces the values assigned to it
+        self.overridden = set()
+        self.kinds = {}      # local name -> 'num' or 'color'
+        self.colors = {}     # color name -> tuple
+        self.lines = []
+        self.returns = 0
+        self.temp = 0
+        self.default = None
+
+    def new_temp(self, prefix):
+        self.temp += 1
+        return f"_{prefix}{self.temp}"
+
+    def emit(self, depth, line):
+        self.lines.append('    ' * depth + line)
+
+    # --- expressions -> source (numbers, arrays and masks)
+
+    def color(self, node):
+        # A color operand: constant tuple, or a name bound to one
+        if isinstance(node, ast.Tuple):
+            value = tuple(self.constant(e) for e in node.elts)
+            if is_color(value):
+                return value
+        elif isinstance(node, ast.Name):
+            if self.kinds.get(node.id) == 'color':
+                return self.colors[node.id]
+            if node.id not in self.kinds and is_color(self.globals.get(node.id)):
+                return self.globals[node.id]
+        raise Unsupported(f"line {node.lineno}: colors must be constant tuples")
+
+    def constant(self, node):
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            return node.value
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            return -self.constant(node.operand)
+        raise Unsupported(f"line {node.lineno}: color components must be constants")
+
+    def expr(self, node):
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float, bool)):
+            return repr(node.value)
+        if isinstance(node, ast.Name):
+            kind = self.kinds.get(node.id)
+            if kind == 'num':
+                return node.id
+            if kind is None and node.id in self.globals and isinstance(self.globals[node.id], (int, float)):
+                return repr(self.globals[node.id])
+            raise Unsupported(f"line {node.lineno}: '{node.id}' is not a number")
+        if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPS:
+            return f"({self.expr(node.left)} {BINARY_OPS[type(node.op)]} {self.expr(node.right)})"
+        if isinstance(node, ast.UnaryOp):
+            if isinstance(node.op, ast.USub):
+                return f"(-{self.expr(node.operand)})"
+            if isinstance(node.op, ast.UAdd):
+                return self.expr(node.operand)
+            if isinstance(node.op, ast.Not):
+                return f"_np.logical_not({self.expr(node.operand)})"
+        if isinstance(node, ast.BoolOp):
+            func = '_np.logical_and' if isinstance(node.op, ast.And) else '_np.logical_or'
+            src = self.expr(node.values[0])
+            for value in node.values[1:]:
+                src = f"{func}({src}, {self.expr(value)})"
+            return src
+        if isinstance(node, ast.Compare) and all(type(op) in COMPARE_OPS for op in node.ops):
+            operands = [self.expr(node.left)] + [self.expr(c) for c in node.comparators]
+            tests = [f"({a} {COMPARE_OPS[type(op)]} {b})" for a, op, b in zip(operands, node.ops, operands[1:])]
+            src = tests[0]
+            for test in tests[1:]:
+                src = f"_np.logical_and({src}, {test})"
+            return src
+        if isinstance(node, ast.IfExp):
+            return f"_np.where({self.expr(node.test)}, {self.expr(node.body)}, {self.expr(node.orelse)})"
+        if isinstance(node, ast.Attribute) and self.is_math(node.value) and node.attr in MATH_CONSTANTS:
+            return repr(MATH_CONSTANTS[node.attr])
+        if isinstance(node, ast.Call) and not node.keywords:
+            return self.call(node)
+        raise Unsupported(f"line {node.lineno}: cannot translate {ast.unparse(node)!r}")
+
+    def is_math(self, node):
+        return isinstance(node, ast.Name) and node.id not in self.kinds and self.globals.get(node.id) is math
+
+    def call(self, node):
+        args = [self.expr(a) for a in node.args]
+        func = node.func
+        if isinstance(func, ast.Attribute) and self.is_math(func.value) and func.attr in MATH_FUNCTIONS:
+            return f"_np.{MATH_FUNCTIONS[func.attr]}({', '.join(args)})"
+        if isinstance(func, ast.Name) and func.id not in self.kinds:
+            if func.id == 'abs' and len(args) == 1:
+                return f"_np.abs({args[0]})"
+            if func.id == 'float' and len(args) == 1:
+                return args[0]
+            if func.id in ('min', 'max') and len(args) >= 2:
+                name = '_np.minimum' if func.id == 'min' else '_np.maximum'
+                src = args[0]
+                for arg in args[1:]:
+                    src = f"{name}({src}, {arg})"
+                return src
+        raise Unsupported(f"line {node.lineno}: cannot translate call {ast.unparse(node)!r}")
+
+    # --- statements
+
+    def assign(self, name, value, mask, depth):
+        # Bind `name` on the current path; outside it the old value stays
+        if isinstance(value, tuple):
+            if mask is not None or self.kinds.get(name) == 'num':
+                raise Unsupported(f"color '{name}' is assigned conditionally")
+            self.kinds[name] = 'color'
+            self.colors[name] = value
+            return
+        if self.kinds.get(name) == 'color':
+            raise Unsupported(f"'{name}' holds both colors and numbers")
+        if name in self.overrides:
+            value = repr(self.overrides[name])
+            self.overridden.add(name)
+        if mask is None or name not in self.kinds:
+            self.emit(depth, f"{name} = {value}")
+        else:
+            self.emit(depth, f"{name} = _np.where({mask}, {value}, {name})")
+        self.kinds[name] = 'num'
+
+    def value(self, node):
+        # Right-hand side: a color tuple or a numeric source expression
+        if isinstance(node, ast.Tuple) or (isinstance(node, ast.Name) and self.kinds.get(node.id) == 'color'):
+            return self.color(node)
+        return self.expr(node)
+
+    def block(self, statements, mask, depth):
+        # -> True when the block always returns
+        for stmt in statements:
+            if isinstance(stmt, ast.Return):
+                if stmt.value is None:
+                    raise Unsupported(f"line {stmt.lineno}: bare return")
+                color = self.color(stmt.value)
+                if mask is None:
+                    self.default = color
+                    return True
+                self.emit(depth, f"_choices.append(({mask}, {color!r}))")
+                self.returns += 1
+                continue
+            if isinstance(stmt, ast.Assign) and len(stmt.targets) == 1:
+                target = stmt.targets[0]
+                if isinstance(target, ast.Name):
+                    self.assign(target.id, self.value(stmt.value), mask, depth)
+                    continue
+                if (isinstance(target, ast.Tuple) and isinstance(stmt.value, ast.Tuple)
+                        and len(target.elts) == len(stmt.value.elts)
+                        and all(isinstance(t, ast.Name) for t in target.elts)):
+                    # Evaluate every right-hand side before binding, as Python does
+                    values = []
+                    for value in stmt.value.elts:
+                        value = self.value(value)
+                        if isinstance(value, str):
+                            temp = self.new_temp('t')
+                            self.emit(depth, f"{temp} = {value}")
+                            value = temp
+                        values.append(value)
+                    for t, value in zip(target.elts, values):
+                        self.assign(t.id, value, mask, depth)
+                    continue
+            if isinstance(stmt, ast.AugAssign) and isinstance(stmt.target, ast.Name) and type(stmt.op) in BINARY_OPS:
+                name = stmt.target.id
+                if self.kinds.get(name) != 'num':
+                    raise Unsupported(f"line {stmt.lineno}: '{name}' is not a number")
+                self.assign(name, f"({name} {BINARY_OPS[type(stmt.op)]} {self.expr(stmt.value)})", mask, depth)
+                continue
+            if isinstance(stmt, ast.If):
+                cond = self.new_temp('c')
+                self.emit(depth, f"{cond} = {self.expr(stmt.test)}")
+                then_mask = self.new_temp('m')
+                self.emit(depth, f"{then_mask} = {cond}" if mask is None else
+                          f"{then_mask} = _np.logical_and({mask}, {cond})")
+                self.block(stmt.body, then_mask, depth)
+                if stmt.orelse:
+                    else_mask = self.new_temp('m')
+                    negated = f"_np.logical_not({cond})"
+                    self.emit(depth, f"{else_mask} = {negated}" if mask is None else
+                              f"{else_mask} = _np.logical_and({mask}, {negated})")
+                    self.block(stmt.orelse, else_mask, depth)
+                continue
+            if isinstance(stmt, (ast.Pass, ast.Expr)) and not isinstance(getattr(stmt, 'value', None), ast.Call):
+                continue
+            raise Unsupported(f"line {stmt.lineno}: cannot translate {type(stmt).__name__} statement")
+        return False
+
+    def compile(self):
+        try:
+            source = inspect.getsource(self.func)
+        except (OSError, TypeError):
+            raise Unsupported("source code not available")
+        tree = ast.parse(textwrap.dedent(source))
+        ast.increment_lineno(tree, self.func.__code__.co_firstlineno - 1)
+        func_def = tree.body[0]
+        if not isinstance(func_def, ast.FunctionDef) or [a.arg for a in func_def.args.args] != ['x', 'y', 'w', 'h']:
+            raise Unsupported("expected a function (x, y, w, h)")
+        self.kinds.update(x='num', y='num', w='num', h='num')
+        self.emit(2, "_choices = []")
+        if not self.block(func_def.body, None, 2):
+            raise Unsupported("the function does not end with a return")
+        unknown = set(self.overrides) - self.overridden
+        if unknown:
+            raise ValueError(f"{self.func.__name__} has no number assignment to {', '.join(sorted(unknown))}")
+        channels = {len(self.default)} | {len(c) for c in self.colors.values()}
+        if len(channels) != 1:
+            raise Unsupported("colors have different numbers of channels")
+        self.emit(2, "_shape = _np.broadcast_shapes(_np.shape(x), _np.shape(y))")
+        self.emit(2, f"return _select(_shape, _choices, {self.default!r})")
+        lines = [f"def {self.func.__name__}(x, y, w, h):", "    with _np.errstate(all='ignore'):"] + self.lines
+        return '\n'.join(lines) + '\n'
+
+def compile_draw(func, overrides=None):
+    # -> (vectorized function, generated source); raises Unsupported.
+    # overrides {name: number} replace the values assigned to local names,
+    # e.g. {'slit_w': 15}, for parameter sweeps
+    from vector_render import select
+    source = Compiler(func, overrides).compile()
+    namespace = {'_np': np, '_select': select}
+    exec(compile(source, f"<vectorized {func.__module__}.{func.__name__}>", 'exec'), namespace)
+    return namespace[func.__name__], source
+
+def scalar_fallback(func):
+    # Same contract, one scalar call per pixel
+    def draw(x, y, w, h):
+        shape = np.broadcast_shapes(np.shape(x), np.shape(y))
+        xs = np.broadcast_to(x, shape).tolist()
+        ys = np.broadcast_to(y, shape).tolist()
+        return np.array([[func(px, py, w, h) for px, py in zip(row_x, row_y)] for row_x, row_y in zip(xs, ys)],
+                        dtype=np.uint8)
+    return draw
+
+def vectorize(func, overrides=None):
+    # Compiled draw function, or the per-pixel fallback when it cannot be translated;
+    # .compiled, .reason and .source tell which. The fallback cannot apply overrides.
+    try:
+        draw, source = compile_draw(func, overrides)
+        draw.compiled, draw.reason, draw.source = True, None, source
+    except Unsupported as e:
+        if overrides:
+            raise
+        draw = scalar_fallback(func)
+        draw.compiled, draw.reason, draw.source = False, str(e), None
+    return draw
+
+def main():
+    from vector_render import render_array
+
+    parser = argparse.ArgumentParser(description="Compile scalar draw_* functions into NumPy mask-select programs")
+    parser.add_argument('draws', nargs='+', help="module:function, e.g. create_identity_icons:draw_v16")
+    parser.add_argument('--size', type=int, default=512, help="canvas size for the comparison")
+    parser.add_argument('--source', action='store_true', help="print the generated code")
+    args = parser.parse_args()
+
+    for spec in args.draws:
+        func = load_draw(spec)
+        draw = vectorize(func)
+        if args.source and draw.source:
+            print(draw.source)
+        start = time.perf_counter()
+        vector = render_array(args.size, args.size, draw)
+        vector_time = time.perf_counter() - start
+        channels = vector.shape[2]
+        start = time.perf_counter()
+        rows = render_rows(args.size, args.size, func, channels)
+        scalar = np.frombuffer(b''.join(bytes(row) for row in rows), dtype=np.uint8)
+        scalar_time = time.perf_counter() - start
+        mismatched = int(np.any(vector != scalar.reshape(vector.shape), axis=-1).sum())
+        status = "compiled" if draw.compiled else f"scalar fallback ({draw.reason})"
+        print(f"{spec}: {status}; {args.size}px vector {vector_time:.3f}s, scalar {scalar_time:.3f}s "
+              f"({scalar_time / vector_time:.0f}x), {mismatched} pixels differ")
+
+if __name__ == '__main__':
+    main()